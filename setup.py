@@ -50,11 +50,15 @@ setup(
         tests=[
             'unittest2',
         ],
+        numpy=[
+            'numpy',
+        ],
     ),
     entry_points={
         'console_scripts': [
             'example_basic = affinitic.pdf.examples.basic:main',
             'example_table = affinitic.pdf.examples.table:main',
+            'example_displaylist = affinitic.pdf.examples.displaylist:main',
         ],
     },
 )
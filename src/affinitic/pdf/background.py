@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+affinitic.pdf
+-------------
+
+Created by mpeeters
+:copyright: (c) 2015 by Affinitic SPRL
+:license: GPL, see LICENCE.txt for more details.
+"""
+
+from cStringIO import StringIO
+from hashlib import md5
+from pyPdf import PdfFileReader
+from pyPdf import generic
+from reportlab.pdfbase.pdfdoc import PDFArray
+from reportlab.pdfbase.pdfdoc import PDFDictionary
+from reportlab.pdfbase.pdfdoc import PDFObjectReference
+from reportlab.pdfbase.pdfdoc import PDFStream
+import codecs
+import mmap
+import os
+import threading
+
+from affinitic.pdf.cache import LRUCache
+
+background_cache = LRUCache(maxsize=16)
+
+
+class BackgroundFile(object):
+    """
+    A pdf file parsed once, its pages are imported on demand as background
+    forms. The files greater than `mmap_threshold` bytes are memory mapped
+    instead of being read in memory. The file is shared between the
+    documents, the reads of its stream are locked
+    """
+    mmap_threshold = 1024 * 1024
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        stat = os.stat(filepath)
+        self.stat = (stat.st_mtime, stat.st_size)
+        f = open(filepath, 'rb')
+        try:
+            if stat.st_size > self.mmap_threshold:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                stream = data
+            else:
+                data = f.read()
+                stream = StringIO(data)
+        finally:
+            f.close()
+        self.digest = md5(data).hexdigest()
+        self._reader = PdfFileReader(stream)
+        self._forms = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls, filepath, cache=None):
+        """
+        Return the cached file for the given path, the file is parsed again
+        if its modification time or its size changed and its content is
+        different
+        """
+        if cache is None:
+            cache = background_cache
+        key = os.path.abspath(filepath)
+        background = cache.get(key)
+        if background is not None:
+            stat = os.stat(filepath)
+            if background.stat == (stat.st_mtime, stat.st_size):
+                return background
+        new = cls(filepath)
+        if background is not None and background.digest == new.digest:
+            background.stat = new.stat
+            return background
+        cache.set(key, new)
+        return new
+
+    @property
+    def page_count(self):
+        """Return the number of pages of the file"""
+        with self._lock:
+            return self._reader.getNumPages()
+
+    def page(self, number):
+        """Return the background form of the given page (starting at 0)"""
+        form = self._forms.get(number)
+        if form is None:
+            with self._lock:
+                form = self._forms.get(number)
+                if form is None:
+                    form = self._forms[number] = self._load_page(number)
+        return form
+
+    def _load_page(self, number):
+        """Read the page with the given number and return its form"""
+        if not 0 <= number < self._reader.getNumPages():
+            raise ValueError(
+                "The page %s does not exist in '%s'" % (number,
+                                                        self.filepath))
+        return BackgroundForm(
+            'Background%s_%s' % (self.digest, number),
+            self._reader.getPage(number),
+        )
+
+
+class BackgroundForm(object):
+    """
+    A page of a pdf file imported as a form XObject, it is embedded once per
+    document and drawn under the content of the pages. The objects of the
+    page are read when the form is created, the form can be drawn without
+    accessing the file
+    """
+
+    def __init__(self, name, page):
+        self.name = name
+        self.bbox = [float(v) for v in page.mediaBox]
+        self.resources = page.get('/Resources', generic.DictionaryObject())
+        _resolve(self.resources, set())
+        contents = page.get('/Contents')
+        if contents is not None:
+            contents = contents.getObject()
+        if contents is None:
+            contents = []
+        elif not isinstance(contents, generic.ArrayObject):
+            contents = [contents]
+        else:
+            contents = [c.getObject() for c in contents]
+        self.filters = {}
+        if len(contents) == 1:
+            # The content is kept encoded with its original filters
+            self.content = contents[0]._data
+            for key in ('/Filter', '/DecodeParms'):
+                if key in contents[0]:
+                    self.filters[key[1:]] = contents[0][key]
+            _resolve(self.filters.values(), set())
+        else:
+            self.content = '\n'.join([c.getData() for c in contents])
+
+    def draw(self, canvas, index=None):
+        """
+        Draw the background on the canvas at the origin of the page, the
+        operations are inserted at the given index of the page code
+        """
+        if not canvas.hasForm(self.name):
+            canvas._doc.addForm(self.name, self._create_form(canvas._doc))
+        start = len(canvas._code)
+        canvas.saveState()
+        canvas.doForm(self.name)
+        canvas.restoreState()
+        if index is not None:
+            code = canvas._code[start:]
+            del canvas._code[start:]
+            canvas._code[index:index] = code
+
+    def _create_form(self, document):
+        """
+        Return the form XObject with the objects of the page converted for
+        the given document, the converted objects can not be shared between
+        documents
+        """
+        converter = _ObjectConverter(document, self.name)
+        form = PDFStream(content=self.content)
+        if self.filters:
+            form.filters = []
+            for key, value in self.filters.items():
+                form.dictionary[key] = converter.convert(value)
+        form.dictionary['Type'] = '/XObject'
+        form.dictionary['Subtype'] = '/Form'
+        form.dictionary['FormType'] = 1
+        form.dictionary['BBox'] = PDFArray(self.bbox)
+        form.dictionary['Resources'] = converter.convert(self.resources)
+        return form
+
+
+def _resolve(obj, seen):
+    """Read the objects referenced by the given object"""
+    if isinstance(obj, generic.IndirectObject):
+        key = (obj.idnum, obj.generation)
+        if key in seen:
+            return
+        seen.add(key)
+        obj = obj.getObject()
+    if isinstance(obj, dict):
+        obj = obj.values()
+    if isinstance(obj, list):
+        for value in obj:
+            _resolve(value, seen)
+
+
+class _ObjectConverter(object):
+    """Convert the pyPdf objects into ReportLab objects for a document"""
+
+    def __init__(self, document, prefix):
+        self.document = document
+        self.prefix = prefix
+        self._references = {}
+
+    def convert(self, obj):
+        if isinstance(obj, generic.IndirectObject):
+            return self._reference(obj)
+        if isinstance(obj, generic.StreamObject):
+            stream = PDFStream(
+                dictionary=self._dictionary(obj, exclude=('/Length', )),
+                content=obj._data,
+            )
+            if '/Filter' in obj:
+                stream.filters = []
+            return stream
+        if isinstance(obj, generic.DictionaryObject):
+            return self._dictionary(obj)
+        if isinstance(obj, generic.ArrayObject):
+            return PDFArray([self.convert(o) for o in obj])
+        if isinstance(obj, generic.BooleanObject):
+            return obj.value and 'true' or 'false'
+        if isinstance(obj, generic.NullObject):
+            return 'null'
+        if isinstance(obj, generic.FloatObject):
+            return float(obj)
+        if isinstance(obj, generic.NumberObject):
+            return int(obj)
+        if isinstance(obj, generic.NameObject):
+            return str(obj)
+        if isinstance(obj, generic.TextStringObject):
+            try:
+                data = obj.original_bytes
+            except Exception:
+                data = codecs.BOM_UTF16_BE + obj.encode('utf-16be')
+            return '<%s>' % data.encode('hex')
+        if isinstance(obj, basestring):
+            return '<%s>' % obj.encode('hex')
+        return obj
+
+    def _dictionary(self, obj, exclude=()):
+        return PDFDictionary(dict([
+            (key[1:], self.convert(value))
+            for key, value in obj.items() if key not in exclude
+        ]))
+
+    def _reference(self, obj):
+        """
+        Return the reference to the converted object, the reference is
+        defined before the conversion for the cyclic references
+        """
+        key = (obj.idnum, obj.generation)
+        reference = self._references.get(key)
+        if reference is None:
+            name = '%s.%s.%s' % (self.prefix, obj.idnum, obj.generation)
+            reference = self._references[key] = PDFObjectReference(name)
+            self.document.Reference(self.convert(obj.getObject()), name)
+        return reference
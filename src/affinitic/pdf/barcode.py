@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+affinitic.pdf
+-------------
+
+Created by mpeeters
+:copyright: (c) 2015 by Affinitic SPRL
+:license: GPL, see LICENCE.txt for more details.
+"""
+
+from hashlib import md5
+from reportlab.graphics.barcode.widgets import BarcodeCode128
+from reportlab.graphics.shapes import Drawing
+
+from affinitic.pdf.cache import LRUCache
+
+barcode_cache = LRUCache(maxsize=1000)
+
+
+class BarcodeForm(object):
+    """
+    A Code128 barcode with its bars computed once, it is embedded once per
+    document as a form XObject
+    """
+
+    def __init__(self, value, barHeight=None, barWidth=0.75):
+        self.key = (value, barHeight, barWidth)
+        self.name = 'Barcode%s' % md5(repr(self.key)).hexdigest()
+        if barHeight is None:
+            widget = BarcodeCode128(value=value, barWidth=barWidth)
+        else:
+            widget = BarcodeCode128(
+                value=value,
+                barHeight=barHeight,
+                barWidth=barWidth,
+            )
+        self.drawing = Drawing()
+        self.drawing.add(widget.draw())
+        self.bounds = self.drawing.getBounds()
+
+    @classmethod
+    def get(cls, value, barHeight=None, barWidth=0.75, cache=None):
+        """Return the cached barcode for the given parameters"""
+        if cache is None:
+            cache = barcode_cache
+        key = (value, barHeight, barWidth)
+        barcode = cache.get(key)
+        if barcode is None:
+            barcode = cls(value, barHeight=barHeight, barWidth=barWidth)
+            cache.set(key, barcode)
+        return barcode
+
+    def draw(self, canvas, x, y):
+        """Draw the barcode on the canvas at the given position"""
+        if not canvas.hasForm(self.name):
+            canvas.beginForm(self.name, *self.bounds)
+            self.drawing.drawOn(canvas, 0, 0)
+            canvas.endForm()
+        canvas.saveState()
+        canvas.translate(x, y)
+        canvas.doForm(self.name)
+        canvas.restoreState()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+affinitic.pdf
+-------------
+
+Created by mpeeters
+:copyright: (c) 2015 by Affinitic SPRL
+:license: GPL, see LICENCE.txt for more details.
+"""
+
+import threading
+
+_PREV, _NEXT, _KEY, _VALUE = 0, 1, 2, 3
+
+
+class LRUCache(object):
+    """
+    A bounded mapping that discards the least recently used items, it can be
+    shared between threads
+    """
+
+    def __init__(self, maxsize=128):
+        if maxsize < 1:
+            raise ValueError("The cache size must be greater than 0")
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = {}
+        self._root = root = []
+        root[:] = [root, root, None, None]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """Return the value for the given key and mark it as recently used"""
+        with self._lock:
+            link = self._data.get(key)
+            if link is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._unlink(link)
+            self._append(link)
+            return link[_VALUE]
+
+    def set(self, key, value):
+        """Store a value, the oldest item is discarded if the cache is full"""
+        with self._lock:
+            link = self._data.get(key)
+            if link is not None:
+                self._unlink(link)
+                link[_VALUE] = value
+                self._append(link)
+                return
+            if len(self._data) >= self.maxsize:
+                self._discard_oldest()
+            link = [None, None, key, value]
+            self._append(link)
+            self._data[key] = link
+
+    def pop(self, key, default=None):
+        """Remove the given key and return its value"""
+        with self._lock:
+            link = self._data.pop(key, None)
+            if link is None:
+                return default
+            self._unlink(link)
+            return link[_VALUE]
+
+    def clear(self):
+        """Remove all the items and reset the statistics"""
+        with self._lock:
+            self._data.clear()
+            self._root[:] = [self._root, self._root, None, None]
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def resize(self, maxsize):
+        """Change the maximum size, the oldest items are discarded"""
+        if maxsize < 1:
+            raise ValueError("The cache size must be greater than 0")
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._data) > maxsize:
+                self._discard_oldest()
+
+    def info(self):
+        """Return the statistics of the cache"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+            }
+
+    def _discard_oldest(self):
+        """Remove the least recently used item"""
+        oldest = self._root[_NEXT]
+        self._unlink(oldest)
+        del self._data[oldest[_KEY]]
+        self.evictions += 1
+
+    def _append(self, link):
+        """Insert a link as the most recently used item"""
+        root = self._root
+        last = root[_PREV]
+        link[_PREV] = last
+        link[_NEXT] = root
+        last[_NEXT] = link
+        root[_PREV] = link
+
+    def _unlink(self, link):
+        """Remove a link from the usage list"""
+        link[_PREV][_NEXT] = link[_NEXT]
+        link[_NEXT][_PREV] = link[_PREV]
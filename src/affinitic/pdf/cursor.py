@@ -14,12 +14,14 @@ class Cursor(object):
     def __init__(self, x=0, y=0, indent=0):
         self._position = Position(x, y)
         self._indent = indent
+        self._checkpoints = []
         self._track_changes()
 
     def move(self, x=0, y=0):
         """Move the cursor from the current position"""
         if self._t_changes:
-            self._changes.append((x, y * -1))
+            self._delta_x += x
+            self._delta_y += y
         self._position.x += x
         self._position.y += (y * -1)
 
@@ -37,14 +39,35 @@ class Cursor(object):
     def _track_changes(self):
         """Enable the track changes functionnality"""
         self._t_changes = True
-        self._changes = []
+        self._delta_x = 0
+        self._delta_y = 0
 
     def _apply_changes(self, x, y):
         """Apply the tracked changes to the given position"""
-        for change in self._changes:
-            x += change[0] * -1
-            y += change[1] * -1
-        return x, y
+        return x - self._delta_x, y + self._delta_y
+
+    def checkpoint(self):
+        """Save the current position, indentation and tracked changes"""
+        self._checkpoints.append((
+            self._position.x,
+            self._position.y,
+            self._indent,
+            self._delta_x,
+            self._delta_y,
+        ))
+
+    def restore(self):
+        """Rewind the cursor to the last saved checkpoint"""
+        if not self._checkpoints:
+            raise ValueError("There is no checkpoint to restore")
+        (self._position.x, self._position.y, self._indent, self._delta_x,
+         self._delta_y) = self._checkpoints.pop()
+
+    def discard(self):
+        """Remove the last saved checkpoint without moving the cursor"""
+        if not self._checkpoints:
+            raise ValueError("There is no checkpoint to discard")
+        self._checkpoints.pop()
 
     def indent(self, value):
         """Increase or decrease the current identation"""
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+affinitic.pdf
+-------------
+
+Created by mpeeters
+:copyright: (c) 2015 by Affinitic SPRL
+:license: GPL, see LICENCE.txt for more details.
+"""
+
+from array import array
+import sys
+import threading
+
+
+class DisplayList(object):
+    """
+    Compact list of the drawing operations recorded by a flowable
+
+    The operations are stored as opcodes in an array, the positions as packed
+    floats and the arguments without the flowable that records them, the
+    keyword arguments are only kept for the operations that use them as a
+    tuple of values with a shared tuple of names
+    """
+    __slots__ = ('_codes', '_positions', '_arguments', '_kwargs', '_counts')
+    _methods = []
+    _opcodes = {}
+    _keywords = {}
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self._codes = array('H')
+        self._positions = array('d')
+        self._arguments = []
+        self._kwargs = {}
+        self._counts = {}
+
+    @classmethod
+    def opcode(cls, method):
+        """
+        Return the opcode of the given method, register it if necessary. The
+        flowable methods are registered when they are decorated, the
+        registration is locked for the methods recorded from several threads
+        """
+        code = cls._opcodes.get(method)
+        if code is None:
+            with cls._lock:
+                code = cls._opcodes.get(method)
+                if code is None:
+                    code = len(cls._methods)
+                    cls._methods.append(method)
+                    cls._opcodes[method] = code
+        return code
+
+    def append(self, method, args, kwargs, x, y):
+        """
+        Record a drawing operation at the given position, the arguments must
+        not contain the flowable
+        """
+        code = self.opcode(method)
+        if kwargs:
+            keys = tuple(sorted(kwargs))
+            keys = self._keywords.setdefault(keys, keys)
+            self._kwargs[len(self._codes)] = (
+                keys,
+                tuple([kwargs[k] for k in keys]),
+            )
+        self._codes.append(code)
+        self._positions.append(x)
+        self._positions.append(y)
+        self._arguments.append(args)
+        self._counts[code] = self._counts.get(code, 0) + 1
+
+    def __len__(self):
+        return len(self._codes)
+
+    def counts(self):
+        """Return the number of recorded operations for each method name"""
+        return dict([(self._methods[code].__name__, count)
+                     for code, count in self._counts.items()])
+
+    def nbytes(self):
+        """
+        Return the approximate memory used by the recording, the arguments
+        values are shared with the caller and are not included
+        """
+        size = sys.getsizeof(self._codes) + sys.getsizeof(self._positions)
+        size += sys.getsizeof(self._arguments) + sys.getsizeof(self._kwargs)
+        size += sum([sys.getsizeof(a) for a in self._arguments])
+        size += sum([sys.getsizeof(kw) + sys.getsizeof(kw[1])
+                     for kw in self._kwargs.values()])
+        return size
+
+    def replay(self, flowable, cursor):
+        """Execute the recorded operations in order on the given flowable"""
+        methods = self._methods
+        positions = self._positions
+        kwargs = self._kwargs
+        last_x = last_y = None
+        for index, code in enumerate(self._codes):
+            x = positions[index * 2]
+            y = positions[index * 2 + 1]
+            if index == 0:
+                cursor.move_to(x=x, y=y)
+            else:
+                cursor.move(x=x - last_x, y=y - last_y)
+            last_x, last_y = x, y
+            if index in kwargs:
+                keys, values = kwargs[index]
+                methods[code](flowable, *self._arguments[index],
+                              **dict(zip(keys, values)))
+            else:
+                methods[code](flowable, *self._arguments[index])
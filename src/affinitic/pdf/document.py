@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+affinitic.pdf
+-------------
+
+Created by mpeeters
+:copyright: (c) 2015 by Affinitic SPRL
+:license: GPL, see LICENCE.txt for more details.
+"""
+
+from reportlab.pdfbase.pdfdoc import PDF_SUPPORT_VERSION
+from reportlab.pdfbase.pdfdoc import PDFCrossReferenceTable
+from reportlab.pdfbase.pdfdoc import PDFFile
+from reportlab.pdfbase.pdfdoc import PDFIndirectObject
+from reportlab.pdfbase.pdfdoc import PDFObjectReference
+from reportlab.pdfbase.pdfdoc import PDFTrailer
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import SimpleDocTemplate
+
+
+class DeferredPageCanvas(Canvas):
+    """
+    A canvas that completes its pages when the document is saved, when the
+    number of pages is known. The given function is called for each page
+    with the canvas and the number of pages before the page is shown
+    """
+
+    def __init__(self, page_complete, *args, **kwargs):
+        Canvas.__init__(self, *args, **kwargs)
+        self._page_complete = page_complete
+        self._pages = []
+
+    def showPage(self):
+        self._pages.append(dict(self.__dict__))
+        self._startPage()
+
+    def save(self):
+        page_count = len(self._pages)
+        for state in self._pages:
+            self.__dict__.update(state)
+            self._page_complete(self, page_count)
+            Canvas.showPage(self)
+        self._pages = []
+        Canvas.save(self)
+
+
+class StreamingCanvas(Canvas):
+    """
+    A canvas that writes each page into its file object when the page is
+    shown, the written pages are released. The number of pages is not known
+    when a page is shown, the given function is called with the canvas and
+    `None` before each page is shown
+    """
+
+    def __init__(self, page_complete, filename, *args, **kwargs):
+        Canvas.__init__(self, filename, *args, **kwargs)
+        self._page_complete = page_complete
+        self._writer = PageWriter(filename)
+
+    def showPage(self):
+        if self._page_complete is not None:
+            self._page_complete(self, None)
+        Canvas.showPage(self)
+        self._writer.write_pages(self._doc)
+
+    def save(self):
+        if len(self._code):
+            self.showPage()
+        self._writer.close(self._doc, self)
+
+
+class PageWriter(object):
+    """
+    Write the objects of a ReportLab document into a file object, the pages
+    and their content streams are written as soon as they are complete and
+    are replaced by placeholders. The shared objects (fonts, forms, images,
+    page tree) are written when the document is closed
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.offset = 0
+        self._page_index = 0
+        self._written = set()
+
+    def _write(self, data):
+        self.fileobj.write(data)
+        self.offset += len(data)
+
+    def _start(self, document):
+        """
+        Write the header, the version required by the pages that are not
+        written yet is unknown so the highest version is used
+        """
+        version = max([document._pdfVersion] + PDF_SUPPORT_VERSION.values())
+        self._write(PDFFile(version).format(document))
+        document.encrypt.prepare(document)
+        # The page tree is referenced before the pages so its number is
+        # not allocated while a page is written
+        document.Reference(document.Pages)
+
+    def _write_object(self, document, name):
+        """
+        Write the object with the given name and release it, the object is
+        replaced by its reference
+        """
+        obj = document.idToObject[name]
+        data = PDFIndirectObject(name, obj).format(document)
+        document.idToOffset[name] = self.offset
+        self._write(data)
+        self._written.add(name)
+        reference = document.idToObject[name] = PDFObjectReference(name)
+        return reference
+
+    def write_pages(self, document):
+        """Write the pages that were added to the document"""
+        if not self.offset:
+            self._start(document)
+        pages = document.Pages.pages
+        while self._page_index < len(pages):
+            name = pages[self._page_index].__InternalName__
+            counter = document.objectcounter
+            pages[self._page_index] = self._write_object(document, name)
+            # The objects created for the page (e.g. its content stream)
+            while counter < document.objectcounter:
+                counter += 1
+                self._write_object(document, document.numberToId[counter])
+            self._page_index += 1
+
+    def close(self, document, canvas):
+        """
+        Write the remaining objects, the cross reference table and the
+        trailer, same steps as `PDFDocument.GetPDFData`
+        """
+        if not self.offset:
+            self._start(document)
+        for font in document.delayedFonts:
+            font.addObjects(document)
+        document.info.invariant = document.invariant
+        document.info.digest(document.signature)
+        catalog = document.Reference(document.Catalog)
+        info = document.Reference(document.info)
+        document.Outlines.prepare(document, canvas)
+        if document.Outlines.ready == -1:
+            document.Catalog.Outlines = None
+        encryption = document.encrypt.info()
+        if encryption:
+            encryption = document.Reference(encryption)
+        ids = []
+        counter = 1
+        while counter in document.numberToId:
+            name = document.numberToId[counter]
+            if name not in self._written:
+                self._write_object(document, name)
+            ids.append(name)
+            counter += 1
+        xref = PDFCrossReferenceTable()
+        xref.addsection(0, ids)
+        start = self.offset
+        self._write(xref.format(document))
+        trailer = PDFTrailer(
+            startxref=start,
+            Size=len(ids) + 1,
+            Root=catalog,
+            Info=info,
+            Encrypt=encryption,
+            ID=document.ID(),
+        )
+        self._write(trailer.format(document))
+
+
+class DocumentTemplate(SimpleDocTemplate):
+    """
+    A document template that calls the given functions with the canvas and
+    the document at the beginning and at the end of each page. When
+    `page_complete` is given, it is called for each page with the canvas and
+    the number of pages when the document is saved
+
+    With `streaming`, the pages are written into the file object as soon as
+    they are laid out and `page_complete` is called with `None` as the
+    number of pages
+    """
+
+    def __init__(self, filename, page_begin=None, page_end=None,
+                 page_complete=None, **kwargs):
+        SimpleDocTemplate.__init__(self, filename, **kwargs)
+        self._page_begin = page_begin
+        self._page_end = page_end
+        self._page_complete = page_complete
+        self._stream = None
+
+    def build(self, flowables, streaming=False, **kwargs):
+        if streaming is True:
+            kwargs['canvasmaker'] = self._make_streaming_canvas
+        elif self._page_complete is not None:
+            kwargs['canvasmaker'] = self._make_canvas
+        if isinstance(flowables, StreamingStory):
+            self._stream = flowables
+        try:
+            SimpleDocTemplate.build(self, flowables, **kwargs)
+        finally:
+            self._stream = None
+
+    def handle_documentBegin(self):
+        SimpleDocTemplate.handle_documentBegin(self)
+        if self._stream is not None:
+            self._stream.start()
+
+    def _make_canvas(self, *args, **kwargs):
+        return DeferredPageCanvas(self._page_complete, *args, **kwargs)
+
+    def _make_streaming_canvas(self, *args, **kwargs):
+        return StreamingCanvas(self._page_complete, *args, **kwargs)
+
+    def beforePage(self):
+        if self._page_begin is not None:
+            self._page_begin(self.canv, self)
+
+    def afterPage(self):
+        if self._page_end is not None:
+            self._page_end(self.canv, self)
+
+
+class StreamingStory(list):
+    """
+    A story filled by an iterable while the document is built, each step of
+    the iterable adds flowables to the story. Once the document is started,
+    the iterable is consumed when the document asks for the length of the
+    story and the flowables are laid out by `flush` as soon as they are
+    completed, i.e. when they are not the flowable returned by `current`
+    that can still receive content
+    """
+
+    def __init__(self, flowables, content, current, document):
+        list.__init__(self, flowables)
+        self._content = iter(content)
+        self._current = current
+        self._document = document
+        self._started = False
+        self._pulling = False
+
+    def __len__(self):
+        # The length asked while a flowable is handled (e.g. for the keep
+        # with next) or before the first page doesn't consume the iterable
+        if self._started and self._content is not None and \
+           not self._pulling:
+            self._pulling = True
+            try:
+                for step in self._content:
+                    self.flush()
+            finally:
+                self._pulling = False
+                self._content = None
+        return list.__len__(self)
+
+    def __nonzero__(self):
+        """The story is not consumed while its iterable is in progress"""
+        return self._content is not None or list.__len__(self) > 0
+
+    __bool__ = __nonzero__
+
+    def start(self):
+        """Called by the document when its first page can be laid out"""
+        self._started = True
+
+    def flush(self):
+        """
+        Lay out the completed flowables, the document can only handle them
+        while the iterable is consumed between two flowables of the build
+        """
+        if not self._pulling:
+            return
+        while list.__len__(self) and self[0] is not self._current():
+            self._document.clean_hanging()
+            self._document.handle_flowable(self)
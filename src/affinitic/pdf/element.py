@@ -8,10 +8,20 @@ Created by mpeeters
 :license: GPL, see LICENCE.txt for more details.
 """
 
+from affinitic.pdf.cursor import Cursor
+from affinitic.pdf.displaylist import DisplayList
 from affinitic.pdf.flowable import ExtendedFlowable
 
 
 class DeferredElement(ExtendedFlowable):
+    """
+    An element rendered for each page of the document, `page_number` and
+    `page_count` are defined before each rendering. The space given by
+    `reserved_height` (in the measure unit) is reserved in the content area
+    of the pages
+    """
+    reserved_height = 0
+    page_count = None
 
     def __init__(self, pdf):
         self.pdf = pdf
@@ -19,9 +29,35 @@ class DeferredElement(ExtendedFlowable):
         super(DeferredElement, self).__init__(pdf._measure_unit)
 
     def _render(self):
+        name = '%s.%s' % (self.__class__.__module__, self.__class__.__name__)
+        if not self.pdf.has_stamp(name):
+            with self.pdf.stamp(name):
+                self.render_static()
         self.pdf._currentElement = self
+        if len(self.pdf._stamps[name].elements):
+            self.pdf.add_stamp(name)
         self.render()
 
+    def _render_page(self, page_number, page_count):
+        """Record the elements of the given page"""
+        self.page_number = page_number
+        self.page_count = page_count
+        self.cursor = Cursor()
+        self._elements = DisplayList()
+        pdf = self.pdf
+        element, height = pdf._currentElement, pdf._current_height
+        try:
+            self._render()
+        finally:
+            pdf._currentElement, pdf._current_height = element, height
+
+    def render_static(self):
+        """
+        Render the content that is identical on every page, it is drawn once
+        per document and placed before the content of `render`
+        """
+        pass
+
     def render(self):
         pass
 
@@ -32,3 +68,53 @@ class Footer(DeferredElement):
 
 class Header(DeferredElement):
     """Baseclass for header elements"""
+
+
+class PageRenderer(object):
+    """
+    Draw the header and the footer of each page of a document, they are
+    drawn from the top left corner of the content area defined by the
+    margins (above the space reserved by the header)
+    """
+
+    def __init__(self, pdf, header=None, footer=None):
+        self.pdf = pdf
+        self.header = header and header(pdf) or None
+        self.footer = footer and footer(pdf) or None
+
+    @property
+    def header_height(self):
+        """Return the height reserved by the header"""
+        return self.header and self.header.reserved_height or 0
+
+    @property
+    def footer_height(self):
+        """Return the height reserved by the footer"""
+        return self.footer and self.footer.reserved_height or 0
+
+    def draw(self, canvas, page_count, index):
+        """
+        Draw the header and the footer of the current page of the canvas,
+        the header is inserted at the given index of the page code
+        """
+        frame = self.pdf._measurement_context.frame
+        x = frame._x1 + frame._leftPadding
+        y = frame._y2 - frame._topPadding
+        y += self.header_height * self.pdf._measure_unit
+        page_number = canvas.getPageNumber()
+        if self.header is not None:
+            start = len(canvas._code)
+            self._draw_element(self.header, canvas, frame, x, y, page_number,
+                               page_count)
+            code = canvas._code[start:]
+            del canvas._code[start:]
+            canvas._code[index:index] = code
+        if self.footer is not None:
+            self._draw_element(self.footer, canvas, frame, x, y, page_number,
+                               page_count)
+
+    def _draw_element(self, element, canvas, frame, x, y, page_number,
+                      page_count):
+        element._render_page(page_number, page_count)
+        element._frame = frame
+        element.drawOn(canvas, x, y)
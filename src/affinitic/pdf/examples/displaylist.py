@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+affinitic.pdf
+-------------
+
+Created by mpeeters
+:copyright: (c) 2015 by Affinitic SPRL
+:license: GPL, see LICENCE.txt for more details.
+"""
+
+import sys
+
+from affinitic.pdf.cursor import Position
+from affinitic.pdf.examples.table import TablePdf
+
+
+def tuple_nbytes(elements):
+    """
+    Return the memory used by the given display list if its elements were
+    recorded as tuples: the arguments with the flowable, a dict of keyword
+    arguments and a Position per element, in three lists
+    """
+    size = sys.getsizeof(elements._codes)
+    size += sys.getsizeof([None] * len(elements)) * 2
+    for index, args in enumerate(elements._arguments):
+        keys, values = elements._kwargs.get(index, ((), ()))
+        position = Position(elements._positions[index * 2],
+                            elements._positions[index * 2 + 1])
+        size += sys.getsizeof((None, None))
+        size += sys.getsizeof((None, ) + args)
+        size += sys.getsizeof(dict(zip(keys, values)))
+        size += sys.getsizeof(position) + sys.getsizeof(position.__dict__)
+        size += sys.getsizeof(position.x) + sys.getsizeof(position.y)
+    return size
+
+
+def main():
+    """
+    Print the memory used per recorded element by the display lists of the
+    table example, with the number of rows given as argument (5000 by
+    default), and by the same elements recorded as tuples
+    """
+    rows = len(sys.argv) > 1 and int(sys.argv[1]) or 5000
+    table = TablePdf(rows=rows)
+    table.add_table()
+    count = current = before = 0
+    for flowable in table.pdf._story:
+        elements = getattr(flowable, 'elements', None)
+        if not elements:
+            continue
+        count += len(elements)
+        current += elements.nbytes()
+        before += tuple_nbytes(elements)
+    print '%s elements recorded for %s rows' % (count, rows)
+    print 'tuples:       %.1f bytes per element' % (float(before) / count)
+    print 'display list: %.1f bytes per element' % (float(current) / count)
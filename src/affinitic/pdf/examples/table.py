@@ -8,6 +8,9 @@ Created by mpeeters
 :license: GPL, see LICENCE.txt for more details.
 """
 
+import sys
+import time
+
 from affinitic.pdf.pdf import Pdf
 from affinitic.pdf.style import ColumnStyle
 from affinitic.pdf.style import ColumnHeaderStyle
@@ -19,8 +22,13 @@ from affinitic.pdf.tools import ColorRGB
 
 
 class TablePdf(object):
+    """
+    The sample rows are repeated to get the given number of rows, e.g. to
+    measure the time per cell of a large table
+    """
 
-    def __init__(self):
+    def __init__(self, rows=None):
+        self.rows = rows
         self.pdf = Pdf(margins=[15, 15, 15, 15], styles=self.styles)
 
     @property
@@ -69,6 +77,10 @@ class TablePdf(object):
         return library
 
     def create_pdf(self):
+        self.add_table()
+        self.pdf.write('table.pdf')
+
+    def add_table(self):
         table = self.pdf.add_table('tableid', style='table')
         table.add_column(style='col1')
         table.add_column(style='col2')
@@ -80,10 +92,15 @@ class TablePdf(object):
             table.add_row(row, style=style)
         table.add_row([u'Footer 1', u'Footer 2', u'Footer 3'], style='footer')
         table.render()
-        self.pdf.write('table.pdf')
 
     @property
     def content(self):
+        if self.rows is None:
+            return self.sample
+        return (self.sample[i % len(self.sample)] for i in xrange(self.rows))
+
+    @property
+    def sample(self):
         return (
             ['L1.1', 'L1.2', 'L1.3'],
             ['L2.1', 'L2.2', 'L2.3<br/>lorem ipsum dolor sit amet'],
@@ -118,6 +135,8 @@ class TablePdf(object):
 
 
 def main():
-    pdf = TablePdf()
+    rows = len(sys.argv) > 1 and int(sys.argv[1]) or None
+    start = time.time()
+    pdf = TablePdf(rows=rows)
     pdf.create_pdf()
-    print 'The file table.pdf was generated'
+    print 'The file table.pdf was generated in %.2fs' % (time.time() - start)
@@ -8,25 +8,177 @@ Created by mpeeters
 :license: GPL, see LICENCE.txt for more details.
 """
 
-from reportlab.graphics.barcode.widgets import BarcodeCode128
-from reportlab.graphics.shapes import Drawing
+from hashlib import md5
+import copy
+
+from reportlab.pdfbase.pdfdoc import PDFResourceDictionary
 from reportlab.platypus import Flowable, Paragraph
-from reportlab.platypus.flowables import Image
 
+from affinitic.pdf.barcode import BarcodeForm
+from affinitic.pdf.cache import LRUCache
 from affinitic.pdf.cursor import Cursor
+from affinitic.pdf.displaylist import DisplayList
+from affinitic.pdf.image import ImageRegistry
 from affinitic.pdf.tools import ColorRGB
 
+# The sizes of the measured paragraphs, the size of the cache can be
+# changed with `measurement_cache.resize`
+measurement_cache = LRUCache(maxsize=10000)
+
+
+class GraphicsState(object):
+    """
+    Track the colors of a canvas to emit the color operators only when the
+    color change. The state is only valid while the canvas state is not
+    restored, the elements that draw with other tools (paragraphs, images,
+    ...) save and restore the canvas state and does not affect it
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.stroke_color = None
+        self.fill_color = None
+
+    def set_stroke_color(self, color):
+        """Define the stroke color with a ColorRGB object"""
+        if color is not self.stroke_color:
+            self.canvas.setStrokeColor(color.rgb)
+            self.stroke_color = color
+
+    def set_fill_color(self, color):
+        """Define the fill color with a ColorRGB object"""
+        if color is not self.fill_color:
+            self.canvas.setFillColor(color.rgb)
+            self.fill_color = color
+
+
+class RectangleBatch(object):
+    """
+    Collect the cell rectangles drawn by a flowable, the backgrounds are
+    drawn as one path per color where the adjacent cells of a row are merged
+    and the borders as one path per color where the edges shared by adjacent
+    cells are drawn once. The paths are inserted in the canvas at the
+    position of the first rectangle, under the content drawn after it
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self._reset()
+
+    def _reset(self):
+        """Remove the collected rectangles"""
+        self.index = None
+        self._fills = {}
+        self._fill_colors = []
+        self._edges = {}
+        self._stroke_colors = []
+
+    def add(self, x, y, width, height, fill_color=None, stroke_color=None):
+        """
+        Add a rectangle with the given top left corner and size in points
+        """
+        if self.index is None:
+            self.index = len(self.canvas._code)
+        if fill_color is not None:
+            if fill_color not in self._fills:
+                self._fills[fill_color] = _Lines()
+                self._fill_colors.append(fill_color)
+            self._fills[fill_color].add(
+                (y - height, height),
+                (x, x + width),
+            )
+        if stroke_color is not None:
+            if stroke_color not in self._edges:
+                self._edges[stroke_color] = (_Lines(), _Lines())
+                self._stroke_colors.append(stroke_color)
+            horizontal, vertical = self._edges[stroke_color]
+            horizontal.add((y, ), (x, x + width))
+            horizontal.add((y - height, ), (x, x + width))
+            vertical.add((x, ), (y - height, y))
+            vertical.add((x + width, ), (y - height, y))
+
+    def flush(self):
+        """Draw the collected rectangles"""
+        if self.index is None:
+            return
+        canvas = self.canvas
+        start = len(canvas._code)
+        canvas.saveState()
+        for color in self._fill_colors:
+            canvas.setFillColor(color.rgb)
+            path = canvas.beginPath()
+            for (y, height), segments in self._fills[color].merged():
+                # The backgrounds overlap to avoid any gap between the cells
+                for start_x, end_x in segments:
+                    path.rect(start_x, y, end_x - start_x + 0.3, height + 0.3)
+            # The overlapping rectangles are filled with the non-zero winding
+            # rule (`f` operator) whatever the fill mode of the canvas, the
+            # fill mode can't be given to `drawPath` with ReportLab 2.7
+            canvas._code.append(str(path.getCode()))
+            canvas._code.append('f')
+        for color in self._stroke_colors:
+            canvas.setStrokeColor(color.rgb)
+            path = canvas.beginPath()
+            horizontal, vertical = self._edges[color]
+            for (y, ), segments in horizontal.merged():
+                for start_x, end_x in segments:
+                    path.moveTo(start_x, y)
+                    path.lineTo(end_x, y)
+            for (x, ), segments in vertical.merged():
+                for start_y, end_y in segments:
+                    path.moveTo(x, start_y)
+                    path.lineTo(x, end_y)
+            canvas.drawPath(path, stroke=1, fill=0)
+        canvas.restoreState()
+        code = canvas._code[start:]
+        del canvas._code[start:]
+        canvas._code[self.index:self.index] = code
+        self._reset()
+
+
+class _Lines(object):
+    """
+    Segments grouped by line, the lines are identified by their rounded
+    position to merge the segments of the adjacent cells
+    """
+
+    def __init__(self):
+        self._lines = {}
+        self._order = []
+
+    def add(self, position, segment):
+        key = tuple([round(value, 3) for value in position])
+        line = self._lines.get(key)
+        if line is None:
+            line = self._lines[key] = (position, [])
+            self._order.append(key)
+        line[1].append(segment)
+
+    def merged(self):
+        """Return the position and the merged segments of each line"""
+        return [(self._lines[key][0], _merge_segments(self._lines[key][1]))
+                for key in self._order]
+
+
+def _merge_segments(segments, tolerance=0.001):
+    """Merge the overlapping or adjacent segments of a line"""
+    merged = []
+    for start, end in sorted(segments):
+        if merged and start <= merged[-1][1] + tolerance:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
 
 def add_element(me):
+    # The opcode is assigned at import, before the recordings
+    DisplayList.opcode(me)
 
-    def wrapper(*args, **kwargs):
-        flowable = args[0]
-        flowable._elements.append({
-            'method': me,
-            'args': args,
-            'kwargs': kwargs,
-            'position': flowable.cursor.real_position,
-        })
+    def wrapper(flowable, *args, **kwargs):
+        cursor = flowable.cursor
+        flowable._elements.append(me, args, kwargs, cursor.x, cursor.y * -1)
 
     return wrapper
 
@@ -37,20 +189,19 @@ class ExtendedFlowable(Flowable, object):
         super(ExtendedFlowable, self).__init__()
         self.unit = measure_unit
         self.cursor = Cursor()
-        self._elements = []
+        self._elements = DisplayList()
+
+    @property
+    def elements(self):
+        """Return the display list of the recorded elements"""
+        return self._elements
 
     def draw(self):
         """Draw the elements"""
-        for element in self._elements:
-            position = element['position']
-            if self._elements.index(element) > 0:
-                last_position = self._elements[
-                    self._elements.index(element) - 1]['position']
-                self.cursor.move(x=position.x - last_position.x,
-                                 y=position.y - last_position.y)
-            else:
-                self.cursor.move_to(x=position.x, y=position.y)
-            element['method'](*element['args'], **element['kwargs'])
+        self.graphics = GraphicsState(self.canv)
+        self.rectangles = RectangleBatch(self.canv)
+        self._elements.replay(self, self.cursor)
+        self.rectangles.flush()
 
     def drawOn(self, canvas, *args, **kwargs):
         Flowable.drawOn(self, canvas, *args, **kwargs)
@@ -76,17 +227,43 @@ class ExtendedFlowable(Flowable, object):
     def _draw_paragraph(self, text, style, **kwargs):
         """Draw a paragraph"""
         paragraph_style = style.paragraph_style
+        if kwargs.get('debug', False) is True:
+            paragraph_style = self._debug_paragraph_style(paragraph_style)
         p_width, p_height = self._get_paragraph_size(style, **kwargs)
 
-        canvas = self.canv
         paragraph = Paragraph(text, paragraph_style)
         width, height = paragraph.wrapOn(
             self.canv, p_width, p_height)
+        self._place_paragraph(paragraph, height, style, p_height)
 
+    @add_element
+    def draw_wrapped_paragraph(self, *args, **kwargs):
+        return self._draw_wrapped_paragraph(*args, **kwargs)
+
+    def _draw_wrapped_paragraph(self, paragraph, style, **kwargs):
+        """
+        Draw a paragraph that was already wrapped during the simulation, the
+        wrapped paragraphs are shared through the paragraphs cache of the
+        document and the drawing binds the canvas to the paragraph so a copy
+        is drawn
+        """
+        paragraph = copy.copy(paragraph)
         if kwargs.get('debug', False) is True:
-            paragraph_style.borderWidth = 1
-            paragraph_style.borderColor = ColorRGB(0, 0, 0, alpha=50).rgb
+            paragraph.style = self._debug_paragraph_style(paragraph.style)
+        p_width, p_height = self._get_paragraph_size(style, **kwargs)
+        self._place_paragraph(paragraph, paragraph.height, style, p_height)
+
+    def _debug_paragraph_style(self, paragraph_style):
+        """Return a copy of the paragraph style with a visible border"""
+        return paragraph_style.clone(
+            'debug',
+            borderWidth=1,
+            borderColor=ColorRGB(0, 0, 0, alpha=50).rgb,
+        )
 
+    def _place_paragraph(self, paragraph, height, style, p_height):
+        """Draw a wrapped paragraph at the cursor position"""
+        canvas = self.canv
         y_pos = self.cursor.y - style.padding_top - style.space_before
         paragraph.drawOn(
             canvas,
@@ -126,9 +303,9 @@ class ExtendedFlowable(Flowable, object):
             stroke=0):
         """Draw a rectangle"""
         if stroke:
-            self.canv.setStrokeColor(stroke_color.rgb)
+            self.graphics.set_stroke_color(stroke_color)
         if fill:
-            self.canv.setFillColor(bg_color.rgb)
+            self.graphics.set_fill_color(bg_color)
         self.canv.rect(
             self.cursor.x * self.unit,
             self.cursor.y * self.unit - height * self.unit,
@@ -138,6 +315,26 @@ class ExtendedFlowable(Flowable, object):
             stroke=stroke,
         )
 
+    @add_element
+    def draw_cell_rectangle(self, *args, **kwargs):
+        return self._draw_cell_rectangle(*args, **kwargs)
+
+    def _draw_cell_rectangle(
+            self,
+            width,
+            height,
+            bg_color=None,
+            stroke_color=None):
+        """Add a rectangle to the batched rectangles of the flowable"""
+        self.rectangles.add(
+            self.cursor.x * self.unit,
+            self.cursor.y * self.unit,
+            width * self.unit,
+            height * self.unit,
+            fill_color=bg_color,
+            stroke_color=stroke_color,
+        )
+
     @add_element
     def draw_grid(self, *args, **kwargs):
         return self._draw_grid(*args, **kwargs)
@@ -164,7 +361,7 @@ class ExtendedFlowable(Flowable, object):
 
     def _draw_h_line(self, width, color=ColorRGB(r=150, g=150, b=150)):
         """Draw an horizontal line"""
-        self.canv.setStrokeColor(color.rgb)
+        self.graphics.set_stroke_color(color)
         self.canv.line(
             self.cursor.x * self.unit,
             self.cursor.y * self.unit,
@@ -177,7 +374,7 @@ class ExtendedFlowable(Flowable, object):
 
     def _draw_v_line(self, height, color=ColorRGB(r=150, g=150, b=150)):
         """Draw a vertical line"""
-        self.canv.setStrokeColor(color.rgb)
+        self.graphics.set_stroke_color(color)
         self.canv.line(
             self.cursor.x * self.unit,
             self.cursor.y * self.unit,
@@ -190,19 +387,7 @@ class ExtendedFlowable(Flowable, object):
 
     def _draw_barcode(self, value, barHeight, barWidth):
         """Draw a barcode"""
-        barcode = Drawing()
-        if barHeight is None:
-            barcode.add(BarcodeCode128(
-                value=value,
-                barWidth=barWidth
-            ))
-        else:
-            barcode.add(BarcodeCode128(
-                value=value,
-                barHeight=barHeight,
-                barWidth=barWidth
-            ))
-        barcode.drawOn(
+        BarcodeForm.get(value, barHeight=barHeight, barWidth=barWidth).draw(
             self.canv,
             self.cursor.x * self.unit,
             self.cursor.y * self.unit,
@@ -212,35 +397,94 @@ class ExtendedFlowable(Flowable, object):
     def draw_image(self, *args, **kwargs):
         return self._draw_image(*args, **kwargs)
 
-    def _draw_image(self, img_path, width=None, height=None, **kwargs):
-        """Draw an image"""
-        canvas = self.canv
-        img = Image(img_path)
-        _width, _height = img.wrapOn(canvas, 0, 0)
-        _width = _width * 72. / 300
-        _height = _height * 72. / 300
+    def _draw_image(self, image, width=None, height=None, **kwargs):
+        """Draw an image, given as a decoded image or a file path"""
+        if isinstance(image, basestring):
+            image = ImageRegistry().register(image)
+        _width, _height = image.size
         if width is not None:
             _width = width
         if height is not None:
             _height = height
-        canvas.drawImage(
-            img_path,
+        image.draw(
+            self.canv,
             self.cursor.x * self.unit,
             self.cursor.y * self.unit - _height,
             _width,
             _height,
         )
 
+    @add_element
+    def draw_stamp(self, *args, **kwargs):
+        return self._draw_stamp(*args, **kwargs)
+
+    def _draw_stamp(self, stamp):
+        """Draw a stamp at the current cursor position"""
+        stamp.place(self)
+
+
+class Stamp(ExtendedFlowable):
+    """
+    A block of elements drawn once per document as a form XObject, the form
+    is placed by reference at the cursor position of other flowables
+    """
+
+    def __init__(self, measure_unit, name):
+        super(Stamp, self).__init__(measure_unit)
+        self.name = name
+        self.form_name = 'Stamp%s' % md5(repr(name)).hexdigest()
+
+    def place(self, flowable):
+        """Draw the stamp at the cursor position of the given flowable"""
+        canvas = flowable.canv
+        if not canvas.hasForm(self.form_name):
+            # The elements can be drawn above or below the origin
+            width, height = canvas._pagesize
+            canvas.beginForm(self.form_name, -width, -height, width, height)
+            self.canv = canvas
+            self._frame = flowable._frame
+            self.cursor = Cursor()
+            self.draw()
+            canvas.endForm()
+            self._set_form_resources(canvas)
+        canvas.saveState()
+        canvas.translate(
+            flowable.cursor.x * flowable.unit,
+            flowable.cursor.y * flowable.unit,
+        )
+        canvas.doForm(self.form_name)
+        canvas.restoreState()
+
+    def _set_form_resources(self, canvas):
+        """
+        Add the graphics states (used for the transparency) to the resources
+        of the form, ReportLab only defines the fonts and the xobjects
+        """
+        document = canvas._doc
+        form = document.idToObject[document.getXObjectName(self.form_name)]
+        if form.ExtGState:
+            resources = PDFResourceDictionary()
+            resources.basicFonts()
+            resources.allProcs()
+            if form.XObjects:
+                resources.XObject = form.XObjects
+            resources.ExtGState = form.ExtGState
+            form.Resources = resources
+
 
 class SimulationFlowable(ExtendedFlowable):
 
-    def __init__(self, measure_unit, document):
+    def __init__(self, measure_unit, context, cache=None, paragraphs=None):
         Flowable.__init__(self)
         self.unit = measure_unit
         self.cursor = Cursor()
-        self._elements = []
-        self.canv = document.canv
-        self._frame = document.pageTemplate.frames[0]
+        self._elements = DisplayList()
+        self.canv = context.canv
+        self._frame = context.frame
+        if cache is None:
+            cache = measurement_cache
+        self._cache = cache
+        self._paragraphs = paragraphs
 
     def draw(self):
         return
@@ -250,11 +494,40 @@ class SimulationFlowable(ExtendedFlowable):
 
     def paragraph_size(self, text, style, **kwargs):
         """Return the simulated paragraph final size"""
-        paragraph_style = style.paragraph_style
         p_width, p_height = self._get_paragraph_size(style, **kwargs)
-        paragraph = Paragraph(text, paragraph_style)
-        width, height = paragraph.wrapOn(self.canv, p_width, p_height)
+        key = (text, style.fingerprint, p_width, p_height)
+        size = self._cache.get(key)
+        if size is None:
+            size = self._wrap(key, text, style)[1:]
+        return size[0] / self.unit, size[1] / self.unit
+
+    def wrap_paragraph(self, text, style, **kwargs):
+        """
+        Return the wrapped paragraph with its width and height, the wrapped
+        paragraphs are shared through the paragraphs cache of the document
+        """
+        p_width, p_height = self._get_paragraph_size(style, **kwargs)
+        key = (text, style.fingerprint, p_width, p_height)
+        result = None
+        if self._paragraphs is not None:
+            result = self._paragraphs.get(key)
+        if result is None:
+            result = self._wrap(key, text, style)
+            if self._paragraphs is not None:
+                self._paragraphs.set(key, result)
+        paragraph, width, height = result
         return (
+            paragraph,
             width / self.unit,
             height / self.unit,
         )
+
+    def _wrap(self, key, text, style):
+        """
+        Wrap a paragraph and store its size in the measurement cache, only
+        the size is kept in the shared cache
+        """
+        paragraph = Paragraph(text, style.paragraph_style)
+        width, height = paragraph.wrapOn(self.canv, key[2], key[3])
+        self._cache.set(key, (width, height))
+        return paragraph, width, height
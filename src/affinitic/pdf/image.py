@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+affinitic.pdf
+-------------
+
+Created by mpeeters
+:copyright: (c) 2015 by Affinitic SPRL
+:license: GPL, see LICENCE.txt for more details.
+"""
+
+from PIL import Image
+from cStringIO import StringIO
+from hashlib import md5
+from math import ceil
+from reportlab import rl_config
+from reportlab.pdfbase.pdfdoc import PDFImageXObject
+import errno
+import os
+import tempfile
+
+from affinitic.pdf.cache import LRUCache
+
+image_cache = LRUCache(maxsize=64)
+
+
+class DecodedImage(object):
+    """
+    An image file decoded once, it can be drawn on any canvas and is
+    embedded only once per document
+    """
+
+    def __init__(self, digest, data, extension):
+        self.digest = digest
+        self.name = 'Img%s' % digest
+        xobject = PDFImageXObject(self.name)
+        source = StringIO(data)
+        if not (extension in ('.jpg', '.jpeg') and
+                xobject.loadImageFromJPEG(source)):
+            if rl_config.useA85:
+                xobject.loadImageFromA85(source)
+            else:
+                xobject.loadImageFromRaw(source)
+        self._xobject_state = xobject.__dict__.copy()
+        self.width = xobject.width
+        self.height = xobject.height
+
+    @property
+    def size(self):
+        """Return the default size of the image in points (300 dpi)"""
+        return self.width * 72. / 300, self.height * 72. / 300
+
+    def draw(self, canvas, x, y, width, height):
+        """Draw the image on the canvas with the given position and size"""
+        document = canvas._doc
+        reg_name = document.getXObjectName(self.name)
+        if document.idToObject.get(reg_name) is None:
+            # The xobject is registered by the document, a new one is
+            # created for each document from the decoded data
+            xobject = PDFImageXObject(self.name)
+            xobject.__dict__.update(self._xobject_state)
+            canvas._setXObjects(xobject)
+            document.Reference(xobject, reg_name)
+            document.addForm(self.name, xobject)
+        canvas._currentPageHasImages = 1
+        canvas.saveState()
+        canvas.translate(x, y)
+        canvas.scale(width, height)
+        canvas._code.append('/%s Do' % reg_name)
+        canvas.restoreState()
+
+
+class ImageRegistry(object):
+    """
+    The images of a document, each file is read once and the images with an
+    identical content are shared, the decoded images are kept in a bounded
+    cache shared by the documents
+
+    The resampled images are stored in `cache_dir` (by default in a
+    directory of the temporary directory), their file names contain the
+    hash of the source and the target size
+    """
+
+    def __init__(self, cache=None, cache_dir=None):
+        if cache is None:
+            cache = image_cache
+        self._cache = cache
+        self._cache_dir = cache_dir
+        self._paths = {}
+        self._images = {}
+        self._resampled = {}
+
+    def __len__(self):
+        return len(self._images)
+
+    def register(self, path):
+        """Return the decoded image for the given file path"""
+        image = self._paths.get(path)
+        if image is not None:
+            return image
+        data = self._read(path)
+        extension = os.path.splitext(path)[1].lower()
+        image = self._register_data(md5(data).hexdigest(), data, extension)
+        self._paths[path] = image
+        return image
+
+    def register_resampled(self, path, dpi, width=None, height=None):
+        """
+        Return the decoded image for the given file path downsampled to the
+        given resolution and its size in points. The image is used as is if
+        its resolution is already lower, the default size of the image is
+        used if the width or the height are not defined
+        """
+        key = (path, dpi, width, height)
+        result = self._resampled.get(key)
+        if result is not None:
+            return result
+        data = self._read(path)
+        source = Image.open(StringIO(data))
+        width = width or source.size[0] * 72. / 300
+        height = height or source.size[1] * 72. / 300
+        target = (
+            max(int(ceil(width * dpi / 72.)), 1),
+            max(int(ceil(height * dpi / 72.)), 1),
+        )
+        if source.size[0] <= target[0] and source.size[1] <= target[1]:
+            image = self.register(path)
+        else:
+            extension = source.format == 'JPEG' and '.jpg' or '.png'
+            filepath = os.path.join(self.cache_dir, '%s-%dx%d%s' % (
+                md5(data).hexdigest(),
+                target[0],
+                target[1],
+                extension,
+            ))
+            if not os.path.exists(filepath):
+                self._resample(source, target, filepath)
+            image = self.register(filepath)
+        result = self._resampled[key] = (image, width, height)
+        return result
+
+    @property
+    def cache_dir(self):
+        """Return the directory of the resampled images"""
+        if self._cache_dir is None:
+            self._cache_dir = os.path.join(
+                tempfile.gettempdir(),
+                'affinitic.pdf-images',
+            )
+        if not os.path.isdir(self._cache_dir):
+            try:
+                os.makedirs(self._cache_dir)
+            except OSError as e:
+                # The directory was created by another process or thread
+                if e.errno != errno.EEXIST:
+                    raise
+        return self._cache_dir
+
+    def _read(self, path):
+        """Return the content of a file"""
+        f = open(path, 'rb')
+        data = f.read()
+        f.close()
+        return data
+
+    def _register_data(self, digest, data, extension):
+        """Return the decoded image for the given data"""
+        image = self._images.get(digest)
+        if image is None:
+            image = self._cache.get(digest)
+            if image is None:
+                image = DecodedImage(digest, data, extension)
+                self._cache.set(digest, image)
+            self._images[digest] = image
+        return image
+
+    def _resample(self, source, size, filepath):
+        """Write a resized copy of the source image"""
+        image = source
+        if source.format == 'JPEG':
+            if image.mode not in ('L', 'RGB', 'CMYK'):
+                image = image.convert('RGB')
+            options = {'format': 'JPEG', 'quality': 90}
+        else:
+            if image.mode not in ('L', 'RGB', 'RGBA'):
+                image = image.convert('RGB')
+            options = {'format': 'PNG'}
+        image = image.resize(size, Image.ANTIALIAS)
+        # The image is written in a temporary file and renamed to avoid
+        # reading an incomplete file in an other process
+        fd, temppath = tempfile.mkstemp(dir=os.path.dirname(filepath))
+        f = os.fdopen(fd, 'wb')
+        try:
+            image.save(f, **options)
+        finally:
+            f.close()
+        os.rename(temppath, filepath)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+affinitic.pdf
+-------------
+
+Created by mpeeters
+:copyright: (c) 2015 by Affinitic SPRL
+:license: GPL, see LICENCE.txt for more details.
+"""
+
+from cStringIO import StringIO
+from reportlab.lib.units import mm
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus.frames import Frame
+
+from affinitic.pdf.cache import LRUCache
+
+context_cache = LRUCache(maxsize=32)
+
+
+class MeasurementContext(object):
+    """
+    The page geometry of a document with a canvas and a frame used to
+    measure the paragraphs, it is built without a document and is shared by
+    the documents with the same format, orientation, margins and unit
+
+    The margins are given in the measure unit in the order top, right,
+    bottom and left
+    """
+
+    def __init__(self, format, orientation, margins, unit):
+        self.pagesize = orientation(format)
+        self.top_margin = margins[0] * unit - 2 * mm
+        self.right_margin = margins[1] * unit + 2 * mm
+        self.bottom_margin = margins[2] * unit + 2 * mm
+        self.left_margin = margins[3] * unit - 2 * mm
+        # Same computation as the document template to get identical values
+        self.width = (self.pagesize[0] - self.right_margin) - self.left_margin
+        self.height = (self.pagesize[1] - self.top_margin) - self.bottom_margin
+        # The canvas is only used to wrap the paragraphs, nothing is drawn
+        self.canv = Canvas(StringIO(), pagesize=self.pagesize)
+        self.frame = Frame(
+            self.left_margin,
+            self.bottom_margin,
+            self.width,
+            self.height,
+            id='normal',
+        )
+
+    @classmethod
+    def get(cls, format, orientation, margins, unit, cache=None):
+        """Return the cached context for the given parameters"""
+        if cache is None:
+            cache = context_cache
+        key = (tuple(format), orientation, tuple(margins), unit)
+        context = cache.get(key)
+        if context is None:
+            context = cls(format, orientation, margins, unit)
+            cache.set(key, context)
+        return context
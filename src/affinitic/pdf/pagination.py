@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+affinitic.pdf
+-------------
+
+Created by mpeeters
+:copyright: (c) 2015 by Affinitic SPRL
+:license: GPL, see LICENCE.txt for more details.
+"""
+
+from bisect import bisect_right
+
+
+class PaginationPlan(object):
+    """
+    Compute the page breaks of a sequence of rows
+
+    Parameters
+    ----------
+     - heights         (List) The height added by each row
+     - check_heights   (List) The height that must fit in the page before
+                       each row
+     - page_height     (Float) The available height of a page
+     - start_height    (Float) The height already used on the first page
+    """
+
+    def __init__(self, heights, check_heights, page_height, start_height=0):
+        self.heights = heights
+        self.check_heights = check_heights
+        self.page_height = page_height
+        self.start_height = start_height
+        self.cumulative = [0]
+        for height in heights:
+            self.cumulative.append(self.cumulative[-1] + height)
+        self.breaks = self._compute_breaks()
+
+    def _compute_breaks(self):
+        """Return the indexes of the rows that start a new page"""
+        if not self.heights:
+            return []
+        deltas = [c - h for c, h in zip(self.check_heights, self.heights)]
+        min_delta = min(deltas)
+        max_delta = max(deltas)
+        cumulative = self.cumulative
+        breaks = []
+        start = 0
+        used = self.start_height
+        while start < len(self.heights):
+            offset = used - cumulative[start]
+            # A row k does not fit when offset + cumulative[k + 1] +
+            # deltas[k] is greater than the page height, the rows between
+            # these bounds are the only candidates for the next break
+            low = bisect_right(cumulative, self.page_height - max_delta -
+                               offset, start + 1) - 1
+            high = bisect_right(cumulative, self.page_height - min_delta -
+                                offset, start + 1) - 1
+            index = None
+            for k in range(max(low, start), min(high + 1, len(self.heights))):
+                if offset + cumulative[k] + self.check_heights[k] > \
+                   self.page_height:
+                    index = k
+                    break
+            if index is None:
+                break
+            breaks.append(index)
+            # The first row of a page is always rendered on this page
+            used = self.heights[index]
+            start = index + 1
+        return breaks
+
+    @property
+    def page_count(self):
+        """Return the number of pages used by the rows"""
+        return len(self.breaks) + 1
+
+    @property
+    def pages(self):
+        """Return the (start, end) indexes of the rows for each page"""
+        limits = [0] + self.breaks + [len(self.heights)]
+        return [(limits[i], limits[i + 1]) for i in range(len(limits) - 1)]
+
+    def page_of(self, index):
+        """Return the page number (starting at 0) of the given row index"""
+        return bisect_right(self.breaks, index)
+
+    @property
+    def end_height(self):
+        """Return the height used on the last page after the rows"""
+        if not self.breaks:
+            return self.start_height + self.cumulative[-1]
+        return self.cumulative[-1] - self.cumulative[self.breaks[-1]]
@@ -8,26 +8,59 @@ Created by mpeeters
 :license: GPL, see LICENCE.txt for more details.
 """
 
-from cStringIO import StringIO
-from pyPdf import PdfFileWriter, PdfFileReader
+from contextlib import contextmanager
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.pagesizes import landscape
 from reportlab.lib.pagesizes import portrait
 from reportlab.lib.units import mm
-from reportlab.platypus import SimpleDocTemplate
 from reportlab.platypus.flowables import PageBreak
 
-from affinitic.pdf.element import DeferredElement
+from affinitic.pdf.background import BackgroundFile
+from affinitic.pdf.cache import LRUCache
+from affinitic.pdf.document import DocumentTemplate
+from affinitic.pdf.document import StreamingStory
+from affinitic.pdf.element import PageRenderer
 from affinitic.pdf.flowable import ExtendedFlowable
 from affinitic.pdf.flowable import SimulationFlowable
+from affinitic.pdf.flowable import Stamp
+from affinitic.pdf.image import ImageRegistry
+from affinitic.pdf.measurement import MeasurementContext
+from affinitic.pdf.style import CompiledStyle
 from affinitic.pdf.style import Style
 from affinitic.pdf.style import StyleLibrary
 from affinitic.pdf.table import Table
 from affinitic.pdf.tools import ColorRGB
 
 
+class OutputBuffer(object):
+    """
+    A file object that keeps the written strings without joining or copying
+    them until the content is requested
+    """
+
+    def __init__(self):
+        self._strings = []
+
+    def write(self, data):
+        self._strings.append(data)
+
+    def getvalue(self):
+        """Return the written content"""
+        if len(self._strings) == 1:
+            return self._strings[0]
+        return ''.join(self._strings)
+
+    def chunks(self, chunk_size):
+        """Return an iterator over the written content by chunks"""
+        for data in self._strings:
+            for start in xrange(0, len(data), chunk_size):
+                yield data[start:start + chunk_size]
+
+
 class Pdf(object):
-    _simulation_doc = None
+    # The number of wrapped paragraphs kept by a document to draw the
+    # repeated contents without wrapping them again
+    paragraph_cache_size = 1000
     _orientations = {
         'portrait': portrait,
         'landscape': landscape,
@@ -42,45 +75,95 @@ class Pdf(object):
                  header=None,
                  footer=None,
                  debug=False,
-                 localizer=None):
-        self._io = StringIO()
+                 localizer=None,
+                 measurement_cache=None,
+                 image_cache=None,
+                 image_dpi=None,
+                 image_cache_dir=None,
+                 background_cache=None):
         self._format = format
         self._orientation = self._orientations.get(orientation)
         self._margins = margins
         self._measure_unit = measure_unit
-        self._document = self._create_document(self._io)
+        # The space reserved by the header and the footer is excluded from
+        # the content area
+        self._measurement_context = MeasurementContext.get(
+            format,
+            self._orientation,
+            [
+                margins[0] + getattr(header, 'reserved_height', 0),
+                margins[1],
+                margins[2] + getattr(footer, 'reserved_height', 0),
+                margins[3],
+            ],
+            measure_unit,
+        )
+        self._doctemplate = None
         self._story = []
         self._currentElement = None
-        self._styles = styles or StyleLibrary()
+        self._styles = (styles or StyleLibrary()).scope()
         self._debug = debug
         self._header = header
         self._footer = footer
         self._page_counter = 1
         self._current_height = 0.0
         self._uids = []
+        self._stamps = {}
+        self._measurement_cache = measurement_cache
+        self._paragraphs = LRUCache(maxsize=self.paragraph_cache_size)
+        self._images = ImageRegistry(
+            cache=image_cache,
+            cache_dir=image_cache_dir,
+        )
+        self._image_dpi = image_dpi
+        self._background_cache = background_cache
+        self._backgrounds = None
+        self._page_start = 0
+        self._page_starts = []
 
         self.localizer = localizer
 
+        self._page_renderer = None
+        if self._header or self._footer:
+            self._page_renderer = PageRenderer(
+                self,
+                header=self._header,
+                footer=self._footer,
+            )
         if self._debug is True:
             self.add_grid(5, ColorRGB(200, 0, 0, alpha=50))
-        if self._header:
-            self._story.append(self._header(self))
-
-    def _create_document(self, io):
-        return SimpleDocTemplate(
-            io,
-            pagesize=self._orientation(self._format),
-            topMargin=self._margins[0] * self._measure_unit - 2 * mm,
-            rightMargin=self._margins[1] * self._measure_unit + 2 * mm,
-            bottomMargin=self._margins[2] * self._measure_unit + 2 * mm,
-            leftMargin=self._margins[3] * self._measure_unit - 2 * mm,
+
+    @property
+    def _document(self):
+        """Return the document, it is created on the first use"""
+        if self._doctemplate is None:
+            self._doctemplate = self._create_document()
+        return self._doctemplate
+
+    def _create_document(self):
+        context = self._measurement_context
+        page_complete = None
+        if self._page_renderer is not None:
+            page_complete = self._complete_page
+        return DocumentTemplate(
+            None,
+            page_begin=self._begin_page,
+            page_end=self._end_page,
+            page_complete=page_complete,
+            pagesize=context.pagesize,
+            topMargin=context.top_margin,
+            rightMargin=context.right_margin,
+            bottomMargin=context.bottom_margin,
+            leftMargin=context.left_margin,
         )
 
-    def _get_simulation_document(self):
-        if not self._simulation_doc:
-            self._simulation_doc = self._create_document(StringIO())
-            self._simulation_doc.build([])
-        return self._simulation_doc
+    def _get_simulation_flowable(self):
+        return SimulationFlowable(
+            self._measure_unit,
+            self._measurement_context,
+            cache=self._measurement_cache,
+            paragraphs=self._paragraphs,
+        )
 
     @property
     def page_number(self):
@@ -89,16 +172,12 @@ class Pdf(object):
     @property
     def width(self):
         """Return the document width"""
-        doc = self._document
-        width = doc.width / self._measure_unit
-        return width
+        return self._measurement_context.width / self._measure_unit
 
     @property
     def height(self):
         """Return the document height"""
-        doc = self._document
-        height = doc.height / self._measure_unit
-        return height
+        return self._measurement_context.height / self._measure_unit
 
     @property
     def current_height(self):
@@ -112,11 +191,7 @@ class Pdf(object):
 
     def add_page_break(self):
         """Add a page break element"""
-        if self._footer:
-            self._story.append(self._footer(self))
         self._story.append(PageBreak())
-        if self._header:
-            self._story.append(self._header(self))
         self._page_counter += 1
         if self._debug is True:
             self.add_grid(5, ColorRGB(200, 0, 0, alpha=50))
@@ -128,29 +203,83 @@ class Pdf(object):
         element = ExtendedFlowable(self._measure_unit)
         self._currentElement = element
         self._story.append(element)
+        if isinstance(self._story, StreamingStory):
+            self._story.flush()
 
     def add_grid(self, size, color):
         """Display a grid with the given size and color"""
+        name = 'grid-%s-%s-%s-%s-%s' % (
+            size,
+            color.red,
+            color.green,
+            color.blue,
+            color.alpha,
+        )
+        if not self.has_stamp(name):
+            stamp = Stamp(self._measure_unit, name)
+            width = self._measurement_context.width / mm
+            height = self._measurement_context.height / mm
+            stamp.draw_grid(size, width, height, color)
+            self._stamps[name] = stamp
         element = ExtendedFlowable(self._measure_unit)
-        width = self._document.width / mm
-        height = self._document.height / mm
-        element.draw_grid(size, width, height, color)
+        element.draw_stamp(self._stamps[name])
         self._story.append(element)
 
+    @contextmanager
+    def stamp(self, name):
+        """
+        Record the elements added in the block in a stamp, the stamp is drawn
+        once per document and can be placed with `add_stamp`
+
+        >>> with pdf.stamp('logo'):
+        ...     pdf.add_image('logo.png')
+        ...     pdf.add_h_line()
+        >>> pdf.add_stamp('logo')
+        """
+        if self.has_stamp(name):
+            raise ValueError("The stamp '%s' is already defined" % name)
+        stamp = Stamp(self._measure_unit, name)
+        element, height = self._currentElement, self._current_height
+        self._currentElement = stamp
+        try:
+            yield stamp
+        finally:
+            self._currentElement, self._current_height = element, height
+        self._stamps[name] = stamp
+
+    def has_stamp(self, name):
+        """Verify if the given stamp name is defined"""
+        return name in self._stamps
+
+    def add_stamp(self, name):
+        """Place a stamp at the current cursor position"""
+        if not self.has_stamp(name):
+            raise ValueError("Unknown stamp '%s'" % name)
+        self._verify_element()
+        self._currentElement.draw_stamp(self._stamps[name])
+
     def add_style(self, stylename, style, inherits=None):
         """Add a new style"""
         self._styles.define(stylename, style, inherits=None)
 
     def get_style(self, style, inherits=None):
         """Return the style for the given style name"""
-        if isinstance(style, Style):
+        if isinstance(style, (Style, CompiledStyle)):
             return style
         return self._styles.get(style, inherits=inherits)
 
+    def get_compiled_style(self, style, inherits=None):
+        """Return the compiled style for the given style name"""
+        if isinstance(style, CompiledStyle):
+            return style
+        if isinstance(style, Style):
+            return style.compile()
+        return self._styles.get_compiled(style, inherits=inherits)
+
     def add_paragraph(self, text, style='paragraph', width=None, height=None):
         """Add a new paragraph element"""
         self._verify_element()
-        style = self.get_style(style)
+        style = self.get_compiled_style(style)
         self._currentElement.draw_paragraph(
             text,
             style,
@@ -168,6 +297,27 @@ class Pdf(object):
             height = style.height
         self._adapt_height(height + style.padding_v)
 
+    def add_wrapped_paragraph(
+            self,
+            paragraph,
+            paragraph_height,
+            style,
+            width=None,
+            height=None):
+        """Add a paragraph element that was wrapped with `wrap_paragraph`"""
+        self._verify_element()
+        style = self.get_compiled_style(style)
+        self._currentElement.draw_wrapped_paragraph(
+            paragraph,
+            style,
+            width=width,
+            height=height,
+            debug=self._debug,
+        )
+        if paragraph_height < style.height:
+            paragraph_height = style.height
+        self._adapt_height(paragraph_height + style.padding_v)
+
     def simulate_paragraph_size(
             self,
             text,
@@ -175,11 +325,24 @@ class Pdf(object):
             width=None,
             height=None):
         """Return the simulated paragraph size"""
-        document = self._get_simulation_document()
-        element = SimulationFlowable(self._measure_unit, document)
+        element = self._get_simulation_flowable()
         return element.paragraph_size(
             text,
-            self.get_style(style),
+            self.get_compiled_style(style),
+            width=width,
+            height=height,
+        )
+
+    def wrap_paragraph(self, text, style='paragraph', width=None, height=None):
+        """
+        Return a paragraph wrapped on the simulation document with its
+        simulated width and height, it can be drawn later with
+        `add_wrapped_paragraph`
+        """
+        element = self._get_simulation_flowable()
+        return element.wrap_paragraph(
+            text,
+            self.get_compiled_style(style),
             width=width,
             height=height,
         )
@@ -196,7 +359,7 @@ class Pdf(object):
         """Add a horizontal line"""
         self._verify_element()
         self._currentElement.draw_h_line(
-            self._document.width / mm,
+            self._measurement_context.width / mm,
             color=color,
         )
 
@@ -219,45 +382,229 @@ class Pdf(object):
             stroke=stroke,
         )
 
+    def add_cell_rectangle(self, width, height, bg_color=None,
+                           stroke_color=None):
+        """
+        Add a rectangle drawn with the other cell rectangles of the element,
+        the backgrounds and the borders are batched in one path per color
+        """
+        self._verify_element()
+        self._currentElement.draw_cell_rectangle(
+            width,
+            height,
+            bg_color=bg_color,
+            stroke_color=stroke_color,
+        )
+
     def add_barcode(self, value, barHeight=None, barWidth=0.75):
         """Add a barcode"""
         self._verify_element()
         self._currentElement.draw_barcode(value, barHeight, barWidth)
 
-    def add_image(self, img_path, width=None, height=None):
-        """Add an image"""
+    def add_barcode_sheet(
+            self,
+            values,
+            columns,
+            rows,
+            width,
+            height,
+            barHeight=None,
+            barWidth=0.75):
+        """
+        Add the barcodes of the given values in a grid, a new page is used
+        when the grid is full. The grid height must fit on a page
+
+        Parameters
+        ----------
+         - values       (Iterable) The values of the barcodes
+         - columns      (Integer) The number of columns of the grid
+         - rows         (Integer) The number of rows of the grid
+         - width        (Float) The width of a cell
+         - height       (Float) The height of a cell, the barcode is placed
+                        at the bottom of the cell
+         - barHeight *  (Float) The height of the bars
+         - barWidth *   (Float) The width of the thinnest bar
+        * Optional
+        """
+        if columns < 1 or rows < 1:
+            raise ValueError("The grid must have at least one column and row")
+        if rows * height > self.height:
+            raise ValueError("The grid height (%s) is greater than the page "
+                             "height (%s)" % (rows * height, self.height))
         self._verify_element()
-        self._currentElement.draw_image(img_path, width=width, height=height)
-
-    def define_background(self, filepath):
-        """Define a pdf file to be set as the background for each pages"""
-        self._background = filepath
+        # The pending cursor moves are applied before the first row
+        start_height = self.current_height + \
+            self.cursor._apply_changes(0, 0)[1]
+        if start_height and start_height + rows * height > self.height:
+            self.add_page_break()
+        size = columns * rows
+        used_rows = 0
+        self.cursor.checkpoint()
+        for index, value in enumerate(values):
+            position = index % size
+            if index and not position:
+                # The next grid starts at the top of a new page, where it
+                # fits since its height is lower than the page height
+                self.cursor.discard()
+                self.add_page_break()
+                self.cursor.checkpoint()
+            row = position // columns
+            self.cursor.restore()
+            self.cursor.checkpoint()
+            self.cursor.move(x=position % columns * width,
+                             y=(row + 1) * height)
+            self._currentElement.draw_barcode(value, barHeight, barWidth)
+            used_rows = row + 1
+        self.cursor.restore()
+        self.cursor.move(y=used_rows * height)
+        self._adapt_height(0)
+
+    def add_image(self, img_path, width=None, height=None, dpi=None):
+        """
+        Add an image, each image file is decoded and embedded once
+
+        Parameters
+        ----------
+         - img_path     (String) The path of the image file
+         - width *      (Float) The width in points
+         - height *     (Float) The height in points
+         - dpi *        (Integer) The resolution of the embedded image, the
+                        image is downsampled if its resolution is higher
+                        (by default the `image_dpi` of the document)
+        * Optional
+        """
+        self._verify_element()
+        dpi = dpi or self._image_dpi
+        if dpi:
+            image, width, height = self._images.register_resampled(
+                img_path,
+                dpi,
+                width=width,
+                height=height,
+            )
+        else:
+            image = self._images.register(img_path)
+        self._currentElement.draw_image(image, width=width, height=height)
+
+    def define_background(self, filepath, page=0, first_page=None,
+                          last_page=None):
+        """
+        Define a pdf file to be set as the background for each pages, the
+        given page of the file (starting at 0) is drawn under the content of
+        the pages. Other pages of the file can be used for the first and the
+        last page of the document, the first page is used for a document of
+        one page. The files are parsed once and shared by the documents
+        """
+        background = BackgroundFile.get(filepath,
+                                        cache=self._background_cache)
+        following = background.page(page)
+        self._backgrounds = {
+            'first': first_page is None and following or
+            background.page(first_page),
+            'following': following,
+            'last': last_page is None and following or
+            background.page(last_page),
+        }
 
     @property
     def content(self):
         """Return the content of the pdf"""
-        if self._footer:
-            self._story.append(self._footer(self))
-        self._render_deferred_elements()
-        self._document.build(self._story)
-        if hasattr(self, '_background'):
-            content = StringIO()
-            self._merge_pdf(self._io.getvalue(), content)
-            return content.getvalue()
-        else:
-            return self._io.getvalue()
+        output = OutputBuffer()
+        self.write_to(output)
+        return output.getvalue()
+
+    def iter_content(self, chunk_size=65536):
+        """
+        Return an iterator over the content of the pdf by chunks of the given
+        size (e.g. for a WSGI response). The whole document is built in
+        memory on the first iteration before the first chunk is returned, the
+        chunks avoid a copy of the content but not its memory use, use
+        `write_stream` to write the pages as soon as they are laid out
+        """
+        output = OutputBuffer()
+        self.write_to(output)
+        for chunk in output.chunks(chunk_size):
+            yield chunk
+
+    def _build(self, output, streaming=False):
+        """Build the document into the given file object"""
+        self._page_starts = []
+        self._document.filename = output
+        self._document.build(self._story, streaming=streaming)
+
+    def _begin_page(self, canvas, document):
+        """Keep the position of the beginning of the page content"""
+        self._page_start = len(canvas._code)
+
+    def _end_page(self, canvas, document):
+        """
+        Draw the background under the content of the page, the last page is
+        known when the story is consumed
+        """
+        start = self._page_start
+        if self._backgrounds is not None:
+            if canvas.getPageNumber() == 1:
+                background = self._backgrounds['first']
+            elif not self._story:
+                background = self._backgrounds['last']
+            else:
+                background = self._backgrounds['following']
+            length = len(canvas._code)
+            background.draw(canvas, index=start)
+            start += len(canvas._code) - length
+        self._page_starts.append(start)
+
+    def _complete_page(self, canvas, page_count):
+        """Draw the header and the footer of a page"""
+        self._page_renderer.draw(
+            canvas,
+            page_count,
+            self._page_starts[canvas.getPageNumber() - 1],
+        )
 
-    def _render_deferred_elements(self):
-        """Render the deferred elements like footers or headers"""
-        for element in self._story:
-            if isinstance(element, DeferredElement):
-                element._render()
+    def write_to(self, fileobj):
+        """
+        Write the content of the pdf into the given file object (a file, a
+        socket file or any object with a `write` method), the document is
+        written without an intermediate copy
+        """
+        self._build(fileobj)
+
+    def write_stream(self, fileobj, content):
+        """
+        Write the pdf into the given file object while its content is added
+        by the given iterable, e.g. a generator that adds elements to the pdf
+        and yields between them. The pages are written into the file object
+        and released as soon as they are laid out, also within a step, only
+        the elements of the pages in progress are kept in memory. The number
+        of pages is unknown when a page is written, the `page_count` of the
+        header and the footer is `None`
+
+        >>> def statements(pdf, accounts):
+        ...     for account in accounts:
+        ...         pdf.add_paragraph(account.name)
+        ...         pdf.add_page_break()
+        ...         yield
+        >>> pdf.write_stream(f, statements(pdf, accounts))
+        """
+        self._story = StreamingStory(
+            self._story,
+            content,
+            lambda: self._currentElement,
+            self._document,
+        )
+        try:
+            self._build(fileobj, streaming=True)
+        finally:
+            self._story = []
 
     def write(self, filepath):
         """Write the content of the pdf into the given file"""
-        f = open(filepath, 'w')
-        f.write(self.content)
-        f.close()
+        f = open(filepath, 'wb')
+        try:
+            self.write_to(f)
+        finally:
+            f.close()
 
     @property
     def cursor(self):
@@ -269,18 +616,3 @@ class Pdf(object):
         """Verify that the current element (flowable) is defined"""
         if self._currentElement is None:
             self.add_element()
-
-    def _merge_pdf(self, io_content, output_file):
-        """Add the background into the pdf"""
-        output = PdfFileWriter()
-        bg_file = open(self._background, 'r')
-        with open("/tmp/merge.pdf", "w") as f:
-            f.write(io_content)
-        with open("/tmp/merge.pdf", "r") as f:
-            content = PdfFileReader(f)
-            for page in content.pages:
-                bg_file.seek(0)
-                new_content = PdfFileReader(bg_file).getPage(0)
-                new_content.mergePage(page)
-                output.addPage(new_content)
-            output.write(output_file)
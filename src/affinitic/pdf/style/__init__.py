@@ -8,7 +8,9 @@ Created by mpeeters
 :license: GPL, see LICENCE.txt for more details.
 """
 
+from affinitic.pdf.style.compiled import CompiledStyle
 from affinitic.pdf.style.library import StyleLibrary
+from affinitic.pdf.style.library import StyleScope
 from affinitic.pdf.style.style import ColumnHeaderStyle
 from affinitic.pdf.style.style import ColumnStyle
 from affinitic.pdf.style.style import RowStyle
@@ -17,9 +19,11 @@ from affinitic.pdf.style.style import TableStyle
 
 __all__ = (
     ColumnHeaderStyle.__name__,
+    CompiledStyle.__name__,
     ColumnStyle.__name__,
     RowStyle.__name__,
     Style.__name__,
     StyleLibrary.__name__,
+    StyleScope.__name__,
     TableStyle.__name__,
 )
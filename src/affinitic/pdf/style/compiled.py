@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+affinitic.pdf
+-------------
+
+Created by mpeeters
+:copyright: (c) 2015 by Affinitic SPRL
+:license: GPL, see LICENCE.txt for more details.
+"""
+
+from reportlab.lib.styles import ParagraphStyle
+
+from affinitic.pdf.cache import LRUCache
+
+paragraph_styles = LRUCache(maxsize=512)
+
+
+class CompiledStyle(object):
+    """
+    Frozen and flattened representation of a resolved style, all the derived
+    values (paddings, alignment, line height, ...) are computed once
+    """
+    _attrs = (
+        'name',
+        'unit',
+        'color',
+        'text_align',
+        'text_indent',
+        'text_transform',
+        'font_family',
+        'font_size',
+        'font_style',
+        'background_color',
+        'border_color',
+        'width',
+        'height',
+        'line_height',
+        'padding',
+        'space_before',
+        'first_line_indent',
+        'border',
+        'vertical_align',
+    )
+    _padding_attrs = (
+        'padding_top',
+        'padding_right',
+        'padding_bottom',
+        'padding_left',
+        'padding_h',
+        'padding_v',
+    )
+    _derived_attrs = (
+        '_color',
+        '_text_align',
+        '_text_transform',
+        '_line_height',
+        '_left_indent',
+        '_right_indent',
+        '_first_line_indent',
+    )
+    _geometry_attrs = (
+        'width',
+        'height',
+        'space_before',
+    )
+    __slots__ = (('style_class', '_paragraph_key') + _attrs + _padding_attrs +
+                 _derived_attrs)
+
+    def __init__(self, style):
+        set_attr = super(CompiledStyle, self).__setattr__
+        set_attr('style_class', style.__class__)
+        for attr in self._attrs:
+            set_attr(attr, getattr(style, attr, None))
+        paddings = style._parse_padding()
+        for key, value in paddings.items():
+            set_attr('padding_%s' % key, value)
+        set_attr('padding_h', paddings['left'] + paddings['right'])
+        set_attr('padding_v', paddings['top'] + paddings['bottom'])
+        for attr in self._derived_attrs:
+            set_attr(attr, getattr(style, attr))
+        match = self.style_class._paragraph_styles_match
+        set_attr('_paragraph_key', tuple(
+            (match[key], getattr(self, key)) for key in sorted(match)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("'%s' object is read-only"
+                             % self.__class__.__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError("'%s' object is read-only"
+                             % self.__class__.__name__)
+
+    def replace(self, **kwargs):
+        """
+        Return a copy of the compiled style with new values for the geometry
+        attributes (width, height and space_before)
+        """
+        style = object.__new__(self.__class__)
+        set_attr = super(CompiledStyle, style).__setattr__
+        for attr in self.__slots__:
+            set_attr(attr, getattr(self, attr))
+        for key, value in kwargs.items():
+            if key not in self._geometry_attrs:
+                raise ValueError("The attribute '%s' cannot be replaced" % key)
+            set_attr(key, value)
+        return style
+
+    @property
+    def fingerprint(self):
+        """Return a hashable value that identify the paragraph rendering"""
+        return self._paragraph_key
+
+    def is_instance(self, cls):
+        """Verify if the compiled style was created from the given class"""
+        return issubclass(self.style_class, cls)
+
+    @property
+    def paragraph_style(self):
+        """
+        Return the ParagraphStyle object that match to the current style
+        attributes, this object is shared and must not be modified
+        """
+        style = paragraph_styles.get(self._paragraph_key)
+        if style is None:
+            style = ParagraphStyle('style', **dict(self._paragraph_key))
+            paragraph_styles.set(self._paragraph_key, style)
+        return style
@@ -20,6 +20,7 @@ class StyleLibrary(object):
     def __init__(self, base_style=None, unit=mm):
         self._styles = {}
         self._unit = unit
+        self._init_cache()
         if base_style:
             base_style.inherit(self._base_style)
 
@@ -34,33 +35,112 @@ class StyleLibrary(object):
             inherits = inherits or []
             inherits.extend(self._auto_inheritance(style))
             for inherit in inherits:
-                style.inherit(self._styles.get(inherit))
+                style.inherit(self._lookup(inherit))
         style.validate()
         self._styles[stylename] = style
+        self._invalidate_cache(stylename)
 
     def get(self, stylename, inherits=None):
         """
         Get a style by his name and inherits from other styles
 
+        The resolved styles are cached and shared between the callers, they
+        must not be modified.
+
         Parameters
         ----------
          - stylename    (String)
          - inherits *   (List) List of style names sorted by inherit position
         * Optional
         """
-        if stylename not in self._styles.keys():
-            raise ValueError("Unknown style '%s'" % stylename)
-        inherits = inherits or []
-        inherits.append('base')
-        style = self._styles[stylename].copy()
-        for inherited_style in inherits:
-            style.inherit(self._styles[inherited_style])
+        style, cached = self._resolve(stylename, inherits)
+        if cached is True:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
         return style
 
+    def _resolve(self, stylename, inherits):
+        """
+        Return the resolved style and a boolean that indicates if it was
+        found in the cache
+        """
+        if not self.has_style(stylename):
+            raise ValueError("Unknown style '%s'" % stylename)
+        key = (stylename, tuple(inherits or []))
+        style = self._cache.get(key)
+        if style is not None:
+            return style, True
+        style = self._lookup(stylename).copy()
+        chain = key[1] + ('base', )
+        for inherited_style in chain:
+            style.inherit(self._lookup(inherited_style))
+        self._cache[key] = style
+        for name in (stylename, ) + chain:
+            self._cache_dependencies.setdefault(name, set()).add(key)
+        return style, False
+
+    def get_compiled(self, stylename, inherits=None):
+        """
+        Get the compiled version of a style by his name and inherits from
+        other styles
+        """
+        key = (stylename, tuple(inherits or []))
+        compiled = self._compiled_cache.get(key)
+        if compiled is not None:
+            self.cache_hits += 1
+            return compiled
+        self.cache_misses += 1
+        compiled = self._resolve(stylename, inherits)[0].compile()
+        self._compiled_cache[key] = compiled
+        return compiled
+
+    def cache_info(self):
+        """Return the statistics of the resolved styles cache"""
+        return {
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'size': len(self._cache),
+        }
+
+    def clear_cache(self):
+        """Remove all the resolved styles from the cache"""
+        self._cache.clear()
+        self._compiled_cache.clear()
+        self._cache_dependencies.clear()
+
+    def _init_cache(self):
+        """Initialize the resolved styles cache and its statistics"""
+        self._cache = {}
+        self._compiled_cache = {}
+        self._cache_dependencies = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _invalidate_cache(self, stylename):
+        """Remove the cached styles that depend on the given style name"""
+        for key in self._cache_dependencies.pop(stylename, ()):
+            self._cache.pop(key, None)
+            self._compiled_cache.pop(key, None)
+
     def get_specific(self, stylename):
         """Return a specific style without any inheritance"""
         return self._styles.get(stylename)
 
+    def scope(self):
+        """
+        Return a child scope of the library, the styles defined in the scope
+        does not affect the library
+        """
+        return StyleScope(self)
+
+    def _lookup(self, stylename):
+        """Return the style defined for the given name"""
+        style = self._styles.get(stylename)
+        if style is None:
+            raise ValueError("Unknown style '%s'" % stylename)
+        return style
+
     def has_style(self, stylename):
         """Verify if the given stylename exist in the library"""
         return stylename in self._styles
@@ -114,3 +194,65 @@ class StyleLibrary(object):
         return inherits
 
     add = define  # Alias for the define method
+
+
+class StyleScope(StyleLibrary):
+    """
+    Copy-on-write layer over a style library, the styles are defined locally
+    and the lookups fall back on the parent library that must not be
+    modified during the life of the scope
+    """
+
+    def __init__(self, parent):
+        self._parent = parent
+        self._styles = {}
+        self._unit = parent._unit
+        self._init_cache()
+
+    def get(self, stylename, inherits=None):
+        """
+        Get a style by his name and inherits from other styles, the chains
+        without local styles are resolved and cached by the parent library
+        """
+        if self._is_local(stylename, inherits):
+            return super(StyleScope, self).get(stylename, inherits=inherits)
+        return self._parent.get(stylename, inherits=inherits)
+
+    def get_compiled(self, stylename, inherits=None):
+        if self._is_local(stylename, inherits):
+            return super(StyleScope, self).get_compiled(
+                stylename,
+                inherits=inherits,
+            )
+        return self._parent.get_compiled(stylename, inherits=inherits)
+
+    def get_specific(self, stylename):
+        """
+        Return a specific style without any inheritance, the styles of the
+        parent library are copied to avoid any modification of the parent
+        """
+        style = self._styles.get(stylename)
+        if style is None:
+            style = self._parent.get_specific(stylename)
+            if style is not None:
+                style = style.copy()
+        return style
+
+    def has_style(self, stylename):
+        return stylename in self._styles or self._parent.has_style(stylename)
+
+    def list(self):
+        return list(set(self._styles.keys()) | set(self._parent.list()))
+
+    def _lookup(self, stylename):
+        style = self._styles.get(stylename)
+        if style is None:
+            return self._parent._lookup(stylename)
+        return style
+
+    def _is_local(self, stylename, inherits):
+        """Verify if a style of the chain is defined in the current scope"""
+        for name in [stylename, 'base'] + list(inherits or []):
+            if name in self._styles:
+                return True
+        return False
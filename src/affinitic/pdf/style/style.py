@@ -12,6 +12,8 @@ import copy
 from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT, TA_JUSTIFY
 from reportlab.lib.styles import ParagraphStyle
 
+from affinitic.pdf.style.compiled import CompiledStyle
+
 
 class Style(object):
     _accepted_attrs = (
@@ -61,6 +63,10 @@ class Style(object):
         """Return a copy of the current object"""
         return copy.deepcopy(self)
 
+    def compile(self):
+        """Return a frozen and flattened version of the current style"""
+        return CompiledStyle(self)
+
     def inherit(self, *styles):
         """Inherits from multiple styles objects"""
         for style in styles:
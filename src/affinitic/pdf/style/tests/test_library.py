@@ -15,6 +15,7 @@ import unittest2
 from affinitic.pdf.tools import ColorRGB
 from affinitic.pdf.style import Style
 from affinitic.pdf.style import StyleLibrary
+from affinitic.pdf.style import StyleScope
 
 
 class TestStyleLibrary(unittest2.TestCase):
@@ -113,6 +114,123 @@ class TestStyleLibrary(unittest2.TestCase):
         lib = StyleLibrary()
         self.assertRaises(ValueError, lib.get, 'foo')
 
+    def test_get_cache(self):
+        """Test StyleLibrary.get(self, stylename, inherits=None) cache"""
+        lib = StyleLibrary()
+        lib.define('test1', Style(font_size=10))
+        lib.define('test2', Style(text_align='center'))
+
+        result = lib.get('test1', inherits=['test2'])
+        self.assertIs(result, lib.get('test1', inherits=['test2']))
+        self.assertIsNot(result, lib.get('test1'))
+        self.assertEqual({'hits': 1, 'misses': 2, 'size': 2},
+                         lib.cache_info())
+
+    def test_get_cache_invalidation(self):
+        """Test StyleLibrary.define(self, stylename, style, inherits=None)"""
+        lib = StyleLibrary()
+        lib.define('test1', Style(font_size=10))
+        lib.define('test2', Style(text_align='center'))
+        lib.define('test3', Style(text_align='right'))
+        lib.get('test1', inherits=['test2'])
+        lib.get('test3')
+
+        lib.define('test2', Style(text_align='justify'))
+
+        self.assertEqual(1, lib.cache_info()['size'])
+        result = lib.get('test1', inherits=['test2'])
+        self.assertEquals('justify', result.text_align)
+
+    def test_get_compiled(self):
+        """Test StyleLibrary.get_compiled(self, stylename, inherits=None)"""
+        lib = StyleLibrary()
+        lib.define('test1', Style(font_size=10))
+        lib.define('test2', Style(text_align='center', padding='2'))
+
+        result = lib.get_compiled('test1', inherits=['test2'])
+        self.assertEqual(10, result.font_size)
+        self.assertEqual(4.0, result.padding_v)
+        self.assertIs(result, lib.get_compiled('test1', inherits=['test2']))
+
+        lib.define('test2', Style(padding='1'))
+        self.assertEqual(2.0, lib.get_compiled('test1', ['test2']).padding_v)
+
+    def test_get_compiled_cache(self):
+        """Test StyleLibrary.get_compiled(self, stylename, inherits=None)
+        cache statistics"""
+        lib = StyleLibrary()
+        lib.define('test1', Style(font_size=10))
+        lib.get_compiled('test1')
+        lib.get_compiled('test1')
+        self.assertEqual({'hits': 1, 'misses': 1, 'size': 1},
+                         lib.cache_info())
+        scope = lib.scope()
+        scope.define('test2', Style(font_size=12))
+        scope.get_compiled('test2')
+        scope.get_compiled('test2')
+        scope.get_compiled('test1')
+        self.assertEqual({'hits': 1, 'misses': 1, 'size': 1},
+                         scope.cache_info())
+        self.assertEqual(2, lib.cache_info()['hits'])
+
+    def test_get_inherits_unchanged(self):
+        """Test StyleLibrary.get(self, stylename, inherits=None)"""
+        lib = StyleLibrary()
+        lib.define('test1', Style(font_size=10))
+        lib.define('test2', Style(text_align='center'))
+        inherits = ['test2']
+        lib.get('test1', inherits=inherits)
+        self.assertEqual(['test2'], inherits)
+
+    def test_scope(self):
+        """Test StyleLibrary.scope(self)"""
+        lib = StyleLibrary()
+        lib.define('test1', Style(font_size=10))
+        scope = lib.scope()
+        scope.define('test2', Style(text_align='center'))
+
+        self.assertTrue(isinstance(scope, StyleScope))
+        self.assertTrue(scope.has_style('test1'))
+        self.assertTrue(scope.has_style('test2'))
+        self.assertFalse(lib.has_style('test2'))
+        self.assertEqual(sorted(self._default_styles + ['test1', 'test2']),
+                         sorted(scope.list()))
+
+        result = scope.get('test1', inherits=['test2'])
+        self.assertEquals(10, result.font_size)
+        self.assertEquals('center', result.text_align)
+        self.assertEqual(0, lib.cache_info()['size'])
+
+    def test_scope_parent_cache(self):
+        """Test StyleScope.get(self, stylename, inherits=None)"""
+        lib = StyleLibrary()
+        lib.define('test1', Style(font_size=10))
+        result = lib.scope().get('test1')
+        self.assertIs(result, lib.scope().get('test1'))
+        self.assertIs(lib.get_compiled('test1'),
+                      lib.scope().get_compiled('test1'))
+
+    def test_scope_override(self):
+        """Test StyleScope.define(self, stylename, style, inherits=None)"""
+        lib = StyleLibrary()
+        lib.define('test1', Style(font_size=10))
+        scope = lib.scope()
+        scope.define('test1', Style(font_size=12))
+
+        self.assertEquals(12, scope.get('test1').font_size)
+        self.assertEquals(10, lib.get('test1').font_size)
+
+    def test_scope_get_specific(self):
+        """Test StyleScope.get_specific(self, stylename)"""
+        lib = StyleLibrary()
+        lib.define('test1', Style(font_size=10))
+        scope = lib.scope()
+
+        style = scope.get_specific('test1')
+        style.font_size = 12
+        self.assertEquals(10, lib.get_specific('test1').font_size)
+        self.assertIsNone(scope.get_specific('foo'))
+
     def test_list(self):
         """Test StyleLibrary.list(self)"""
         lib = StyleLibrary()
@@ -77,6 +77,57 @@ class TestStyle(unittest2.TestCase):
         self.assertEquals('center', style1.text_align)
         self.assertEquals('right', style2.text_align)
 
+    def test_compile(self):
+        """Test Style.compile(self)"""
+        style = self._base_style
+        style.padding = '1 2 3'
+        style.text_align = 'center'
+        compiled = style.compile()
+
+        self.assertEqual('base', compiled.name)
+        self.assertEqual(1.0, compiled.padding_top)
+        self.assertEqual(2.0, compiled.padding_right)
+        self.assertEqual(3.0, compiled.padding_bottom)
+        self.assertEqual(4.0, compiled.padding_h)
+        self.assertEqual(4.0, compiled.padding_v)
+        self.assertEqual(1, compiled._text_align)
+        self.assertAlmostEqual(10.8, compiled._line_height)
+        self.assertEqual(2 * mm, compiled._left_indent)
+        self.assertIsNone(compiled.vertical_align)
+        self.assertTrue(compiled.is_instance(Style))
+        self.assertFalse(compiled.is_instance(TableStyle))
+
+    def test_compile_read_only(self):
+        """Test Style.compile(self)"""
+        compiled = self._base_style.compile()
+        self.assertRaises(AttributeError, setattr, compiled, 'font_size', 10)
+        self.assertRaises(AttributeError, setattr, compiled, 'foo', 'bar')
+
+    def test_compiled_replace(self):
+        """Test CompiledStyle.replace(self, **kwargs)"""
+        compiled = self._base_style.compile()
+        result = compiled.replace(width=10, height=5, space_before=2)
+
+        self.assertEqual(10, result.width)
+        self.assertEqual(5, result.height)
+        self.assertEqual(2, result.space_before)
+        self.assertIsNone(compiled.width)
+        self.assertEqual(compiled.font_size, result.font_size)
+        self.assertRaises(ValueError, compiled.replace, font_size=10)
+
+    def test_compiled_paragraph_style(self):
+        """Test CompiledStyle.paragraph_style"""
+        style1 = self._base_style
+        style2 = self._base_style
+        style3 = self._base_style
+        style3.font_size = 12
+
+        paragraph_style = style1.compile().paragraph_style
+        self.assertEquals(9, paragraph_style.fontSize)
+        self.assertIs(paragraph_style, style1.compile().paragraph_style)
+        self.assertIs(paragraph_style, style2.compile().paragraph_style)
+        self.assertIsNot(paragraph_style, style3.compile().paragraph_style)
+
     def test_inherit(self):
         """Test Style.inherit(self, *styles)"""
         style1 = Style(text_align='center')
@@ -8,18 +8,33 @@ Created by mpeeters
 :license: GPL, see LICENCE.txt for more details.
 """
 
+import csv
+
+from affinitic.pdf.pagination import PaginationPlan
 from affinitic.pdf.style import ColumnHeaderStyle
 from affinitic.pdf.style import ColumnStyle
 from affinitic.pdf.style import RowStyle
-from affinitic.pdf.style import Style
 from affinitic.pdf.style import TableStyle
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class Table(object):
 
     def __init__(self, pdf, id, style):
         self._columns = []
         self._rows = []
+        self._col_widths = []
+        self._row_heights = []
+        self._cell_offsets = {}
+        self._base_styles = {}
+        self._cell_styles = {}
+        self._measures = []
+        self._total_height = 0
+        self._row_offset = 0
         self._pdf = pdf
         self._id = id
         self.style = style
@@ -36,7 +51,11 @@ class Table(object):
         return self._pdf.cursor
 
     def add_column(self, title=None, format=None, style=None, header_style=None):
-        """Add a new column to the table"""
+        """
+        Add a new column to the table, the format (a callable or a string
+        format) is applied to the values of the rows added by
+        `add_rows_from_columns`, `add_rows_from_csv` or `render_stream`
+        """
         if style and isinstance(self._pdf.get_style(style), ColumnStyle) is False:
             raise ValueError(u'The given column style must be an instance of '
                              u'ColumnStyle class')
@@ -54,37 +73,216 @@ class Table(object):
 
     def add_row(self, content, title=None, style=None):
         """Add a new row to the table"""
-        if style and isinstance(self._pdf.get_style(style), RowStyle) is False:
-            raise ValueError(u'The given row style must be an instance of '
-                             u'RowStyle class')
-        content_dict = {}
+        self._append_row(self._create_row(content, title=title, style=style))
+
+    def add_rows_from_columns(self, columns, style=None):
+        """
+        Add the rows of the table from a sequence of columns values (lists,
+        tuples or NumPy arrays), the format of each column is applied in one
+        pass
+
+        The style can be a row style name or a callable that receive the row
+        index and content and return the row style name.
+        """
+        if len(columns) != len(self._columns):
+            raise ValueError("The number of columns (%s) doesn't match to the "
+                             "number of columns (%s)" % (len(columns),
+                                                         len(self._columns)))
+        lengths = set([len(values) for values in columns])
+        if len(lengths) > 1:
+            raise ValueError("The columns must have the same length")
+        if not callable(style):
+            style = _constant(style)
+        columns = [column.format_values(values) for column, values
+                   in zip(self._columns, columns)]
+        for index, content in enumerate(zip(*columns)):
+            row_style = style(index, content)
+            self._verify_row_style(row_style)
+            self._append_row(Row(content, style=row_style))
+
+    def add_rows_from_csv(self, csvfile, style=None, header_style=None,
+                          converters=None, **kwargs):
+        """
+        Add the rows of the table from a csv file (a path or a file object),
+        the first line is used as a header row if an header style is given.
+        The extra keyword arguments are given to the csv reader.
+
+        The values are strings, the converters are a sequence of callables
+        (or `None`) applied to the values of each column before the format,
+        e.g. `(None, float)` for a column with a '%.2f' format.
+        """
+        if converters is not None and len(converters) != len(self._columns):
+            raise ValueError("The number of converters (%s) doesn't match to "
+                             "the number of columns (%s)"
+                             % (len(converters), len(self._columns)))
+        if isinstance(csvfile, basestring):
+            csvfile = open(csvfile, 'rb')
+            try:
+                records = list(csv.reader(csvfile, **kwargs))
+            finally:
+                csvfile.close()
+        else:
+            records = list(csv.reader(csvfile, **kwargs))
+        if header_style is not None and records:
+            self.add_row(records.pop(0), style=header_style)
+        if not records:
+            return
+        columns = zip(*records)
+        if converters is not None:
+            columns = [converter is None and values or map(converter, values)
+                       for converter, values in zip(converters, columns)]
+        self.add_rows_from_columns(columns, style=style)
+
+    def _create_row(self, content, title=None, style=None,
+                    apply_format=False):
+        """Verify the content and return a new row object"""
+        self._verify_row_style(style)
         if len(content) != len(self._columns):
             raise ValueError("The number of content (%s) doesn't match to the "
                              "number of columns (%s)" % (len(content),
                                                          len(self._columns)))
-        for i in range(len(content)):
-            content_dict[self._columns[i].name] = content[i]
-        self._rows.append(Row(content_dict, title=title, style=style))
+        if apply_format is True:
+            content = [column.format_value(value) for column, value
+                       in zip(self._columns, content)]
+        return Row(tuple(content), title=title, style=style)
+
+    def _verify_row_style(self, style):
+        """Verify that the given style is a row style"""
+        if style and isinstance(self._pdf.get_style(style), RowStyle) is False:
+            raise ValueError(u'The given row style must be an instance of '
+                             u'RowStyle class')
+
+    def _append_row(self, row):
+        """Append a row and return its height"""
+        self._rows.append(row)
+        row_style = self._get_row_style(row)
+        self._row_heights.append(row_style.height)
+        height = row_style.height + row_style.padding_v
+        self._total_height += height
+        return height
 
     def render(self):
         """Render the table"""
         self.simulate()
+        self._draw()
+        self._measures = []
+
+    def render_stream(self, rows, style=None):
+        """
+        Render the table with the rows given by an iterable (e.g. a database
+        cursor) without keeping them in memory. The rows are measured and
+        rendered by chunks of a page, after the rows added with `add_row`.
+
+        The style can be a row style name or a callable that receive the row
+        index and content and return the row style name. The column widths
+        are computed with the first chunk.
+
+        Within `Pdf.write_stream`, the drawn chunks are released as their
+        pages are written and the memory doesn't grow with the number of
+        rows, otherwise they are kept until the document is built.
+        """
+        if not callable(style):
+            style = _constant(style)
+        chunk_height = 0
+        first_chunk = True
+        # The rows added with `add_row` are measured with the first chunk
+        self._col_widths = [None] * len(self._columns)
+        self._measures = []
+        self._measure()
+        for index, content in enumerate(rows):
+            row = self._create_row(
+                content,
+                style=style(index, content),
+                apply_format=True,
+            )
+            chunk_height += self._append_measured_row(row)
+            if chunk_height >= self._pdf.height:
+                self._render_chunk(first_chunk)
+                first_chunk = False
+                chunk_height = 0
+        if self._rows or first_chunk:
+            self._render_chunk(first_chunk)
+
+    def _append_measured_row(self, row):
+        """
+        Append a row, wrap the content of its cells and return its height,
+        a row style without height doesn't give the chunk size
+        """
+        height = self._append_row(row)
+        r_idx = len(self._rows) - 1
+        measures = []
+        for c_idx, column in enumerate(self._columns):
+            style = self._get_measure_style(c_idx, column, r_idx, row)
+            measures.append(self._wrap_cell(row, c_idx, style))
+            height = max(height, measures[-1][2] + style.padding_v)
+        self._measures.append(measures)
+        return height
+
+    def _render_chunk(self, first_chunk):
+        """Render the current rows and release them"""
+        self._simulate(reset_widths=first_chunk)
+        self._draw()
+        self._row_offset += len(self._rows)
+        self._rows = []
+        self._row_heights = []
+        self._measures = []
+        self._cell_offsets = {}
+        self._cell_styles = {}
+
+    def pagination_plan(self):
+        """
+        Return the pagination plan of the table rows from the current
+        position in the document
+        """
+        if len(self._measures) != len(self._rows):
+            self.simulate()
+        last = len(self._columns) - 1
+        heights = []
+        check_heights = []
         for r_idx, row in enumerate(self._rows):
+            row_height = self._row_heights[r_idx]
+            height = 0
             for c_idx, column in enumerate(self._columns):
                 style = self._get_cell_style(c_idx, column, r_idx, row)
-                row_style = self._get_row_style(r_idx, row)
-                real_height = style.height + style.padding_v
-
-                if c_idx == 0 and \
-                   self._pdf.current_height + real_height > self._pdf.height:
-                    self._pdf.add_page_break()
+                p_height = self._measures[r_idx][c_idx][2]
+                if c_idx == 0:
+                    check_heights.append(row_height + style.padding_v)
+                if c_idx == last:
+                    height += max(p_height, row_height) + style.padding_v
+                elif p_height > row_height:
+                    # The overflow of a cell is added to the document height
+                    height += p_height - row_height
+            heights.append(height)
+        if heights and self._pdf.current_height + check_heights[0] <= \
+           self._pdf.height:
+            # The pending cursor moves are applied with the first row, they
+            # are lost if the table starts on a new page
+            heights[0] += self.cursor._apply_changes(0, 0)[1]
+        return PaginationPlan(
+            heights,
+            check_heights,
+            self._pdf.height,
+            start_height=self._pdf.current_height,
+        )
 
+    def _draw(self):
+        """Draw the measured rows"""
+        breaks = set(self.pagination_plan().breaks)
+        for r_idx, row in enumerate(self._rows):
+            row_height = self._row_heights[r_idx]
+            if r_idx in breaks:
+                self._pdf.add_page_break()
+            for c_idx, column in enumerate(self._columns):
+                style = self._get_cell_style(c_idx, column, r_idx, row)
+                real_height = style.height + style.padding_v
                 self._generate_background(style)
-                self._pdf.add_paragraph(
-                    getattr(row, column.name),
+                paragraph, width, height = self._measures[r_idx][c_idx]
+                self._pdf.add_wrapped_paragraph(
+                    paragraph,
+                    height,
+                    style,
                     width=style.width,
-                    height=row_style.height,
-                    style=style,
+                    height=row_height,
                 )
                 self.cursor.move(x=style.width)
                 if c_idx + 1 < len(self._columns):
@@ -92,122 +290,172 @@ class Table(object):
             self.cursor.move_to(x=0)
         self.cursor.move_to(x=0)
 
+    def _get_base_style(self, c_idx, column, r_idx, row):
+        """Return the compound style object for the cell without geometry"""
+        header = self._is_header(r_idx) and column.header_style or None
+        key = (c_idx, header, row.style)
+        style = self._base_styles.get(key)
+        if style is None:
+            chain = []
+            if header:
+                chain.append(header)
+            chain.extend([column.style, row.style, self.style])
+            style = self._get_chain_style(chain)
+            self._base_styles[key] = style
+        return style
+
     def _get_cell_style(self, c_idx, column, r_idx, row):
         """Return the compound style object for the current cell"""
-        cell_name = 'table-%s-cell-%s-%s' % (self._id, r_idx, c_idx)
-        col_name = 'table-%s-col-%s' % (self._id, c_idx)
-        row_name = 'table-%s-row-%s' % (self._id, r_idx)
-        chain = []
-        if self._pdf._styles.has_style(cell_name):
-            chain.append(cell_name)
-        if self._pdf._styles.has_style(col_name):
-            chain.append(col_name)
-        if r_idx == 0 and column.header_style:
-            chain.append(column.header_style)
-        chain.append(column.style)
-        if self._pdf._styles.has_style(row_name):
-            chain.append(row_name)
-        chain.append(row.style)
-        chain.append(self.style)
-        return self._get_chain_style(chain)
-
-    def _get_row_style(self, r_idx, row):
-        """Return the compound style object for the current row"""
-        r_name = 'table-%s-row-%s' % (self._id, r_idx)
-        chain = []
-        if self._pdf._styles.has_style(r_name):
-            chain.append(r_name)
-        chain.append(row.style)
-        return self._get_chain_style(chain)
+        header = self._is_header(r_idx) and column.header_style or None
+        row_height = self._row_heights[r_idx]
+        key = (c_idx, header, row.style, row_height)
+        style = self._cell_styles.get(key)
+        if style is None:
+            style = self._get_base_style(c_idx, column, r_idx, row)
+            width = self._col_widths[c_idx]
+            if width is None:
+                width = style.width
+            style = style.replace(width=width, height=row_height)
+            self._cell_styles[key] = style
+        space_before = self._cell_offsets.get((r_idx, c_idx))
+        if space_before is not None:
+            style = style.replace(space_before=space_before)
+        return style
+
+    def _get_measure_style(self, c_idx, column, r_idx, row):
+        """
+        Return the style used to wrap a cell, the column width computed with
+        a previous chunk is kept
+        """
+        if self._col_widths and self._col_widths[c_idx] is not None:
+            return self._get_cell_style(c_idx, column, r_idx, row)
+        return self._get_base_style(c_idx, column, r_idx, row)
+
+    def _is_header(self, r_idx):
+        """Verify if the given row index is the first row of the table"""
+        return r_idx + self._row_offset == 0
+
+    def _get_row_style(self, row):
+        """Return the compound style object for the row"""
+        return self._pdf.get_compiled_style(row.style)
 
     def _get_chain_style(self, chain):
         """Return the compound style object from a chain of styles"""
-        return self._pdf.get_style(
+        return self._pdf.get_compiled_style(
             chain[0],
             inherits=chain[1:],
         )
 
     def simulate(self):
-        """Simulate the table render to handle overflow"""
+        """
+        Simulate the table render to handle overflow, the content of each
+        cell is wrapped once and reused during the render
+        """
+        self._measures = []
+        self._simulate()
+
+    def _simulate(self, reset_widths=True):
+        """Simulate the current rows, the column widths can be kept"""
+        if reset_widths is True:
+            self._col_widths = [None] * len(self._columns)
+        self._base_styles = {}
+        self._cell_styles = {}
+        self._cell_offsets = {}
+        self._measure()
+        self._resolve(reset_widths=reset_widths)
+        self._place()
+
+    def _measure(self):
+        """Wrap the content of the cells that are not measured yet"""
+        for r_idx in range(len(self._measures), len(self._rows)):
+            row = self._rows[r_idx]
+            measures = []
+            for c_idx, column in enumerate(self._columns):
+                style = self._get_measure_style(c_idx, column, r_idx, row)
+                measures.append(self._wrap_cell(row, c_idx, style))
+            self._measures.append(measures)
+
+    def _resolve(self, reset_widths=True):
+        """Compute the column widths and the row heights"""
+        for r_idx, row in enumerate(self._rows):
+            for c_idx, column in enumerate(self._columns):
+                style = self._get_base_style(c_idx, column, r_idx, row)
+                paragraph, width, height = self._measures[r_idx][c_idx]
+                self._adapt_size(width, height, style, c_idx, r_idx,
+                                 adapt_width=reset_widths)
+        if reset_widths is False:
+            return
         for c_idx, column in enumerate(self._columns):
+            if self._col_widths[c_idx] is None:
+                continue
+            # The content of an enlarged column must be wrapped again
             for r_idx, row in enumerate(self._rows):
-                style = self._pdf.get_style(
-                    column.style,
-                    inherits=[row.style, self.style],
+                style = self._get_cell_style(c_idx, column, r_idx, row)
+                self._measures[r_idx][c_idx] = self._wrap_cell(
+                    row,
+                    c_idx,
+                    style,
                 )
-                width, height = self._get_paragraph_infos(row, column, style)
-                self._adapt_size(width, height, style, c_idx, r_idx)
-        for c_idx, column in enumerate(self._columns):
-            for r_idx, row in enumerate(self._rows):
+
+    def _place(self):
+        """Compute the vertical position of the cells content"""
+        for r_idx, row in enumerate(self._rows):
+            for c_idx, column in enumerate(self._columns):
                 style = self._get_cell_style(c_idx, column, r_idx, row)
-                width, height = self._get_paragraph_infos(row, column, style)
+                paragraph, width, height = self._measures[r_idx][c_idx]
                 self._adapt_position(width, height, style, c_idx, r_idx)
 
-    def _get_paragraph_infos(self, row, column, style):
-        """Return the simulate width and height of the paragraph"""
-        width, height = self._pdf.simulate_paragraph_size(
-            getattr(row, column.name),
+    def _wrap_cell(self, row, c_idx, style):
+        """Return the wrapped paragraph of a cell with its size"""
+        return self._pdf.wrap_paragraph(
+            row.values[c_idx],
             width=style.width,
             height=style.height,
             style=style,
         )
-        return width, height
 
-    def _adapt_size(self, width, height, style, c_idx, r_idx):
-        """Create specific styles for row or column"""
-        c_name = 'table-%s-col-%s' % (self._id, c_idx)
-        r_name = 'table-%s-row-%s' % (self._id, r_idx)
-        if width > style.width:
-            self._create_style(c_name, width=(width + style.padding_h))
-        if height > style.height:
-            self._create_style(r_name, height=height)
+    def _adapt_size(self, width, height, style, c_idx, r_idx,
+                    adapt_width=True):
+        """Enlarge the column width or the row height to fit the content"""
+        if adapt_width is True and width > style.width:
+            width += style.padding_h
+            col_width = self._col_widths[c_idx]
+            if col_width is None or width > col_width:
+                self._col_widths[c_idx] = width
+        if height > style.height and height > self._row_heights[r_idx]:
+            self._total_height += height - self._row_heights[r_idx]
+            self._row_heights[r_idx] = height
 
     def _adapt_position(self, width, height, style, c_idx, r_idx):
-        """Create specific styles for cells"""
-        cell_name = 'table-%s-cell-%s-%s' % (self._id, r_idx, c_idx)
-        if height < style.height and style.vertical_align is 'middle':
+        """Compute the vertical offset of the cells content"""
+        if height >= style.height:
+            return
+        if style.vertical_align == 'middle':
             space_before = style.space_before + (style.height - height) / 2
-            self._create_style(cell_name, space_before=space_before)
-        if height < style.height and style.vertical_align is 'bottom':
+        elif style.vertical_align == 'bottom':
             space_before = style.space_before + (style.height - height)
-            self._create_style(cell_name, space_before=space_before)
-
-    def _create_style(self, stylename, **kwargs):
-        if self._pdf._styles.has_style(stylename):
-            style = self._pdf._styles.get_specific(stylename)
         else:
-            style = Style(**kwargs)
-        for key, value in kwargs.items():
-            if hasattr(style, key) and getattr(style, key) > value:
-                continue
-            setattr(style, key, value)
-        self._pdf._styles.define(stylename, style)
+            return
+        self._cell_offsets[(r_idx, c_idx)] = space_before
 
     def _generate_background(self, style):
         """Generate the background for a table cell"""
         if not style.border and not style.background_color:
             return
-        fill = style.background_color and 1 or 0
-        bg_color = style.background_color and style.background_color or None
-        stroke_color = style.border_color and style.border_color or None
-        stroke = style.border and style.border or 0
-        self._pdf.add_rectangle(
+        stroke_color = None
+        if style.border:
+            stroke_color = style.border_color
+        self._pdf.add_cell_rectangle(
             style.width,
             style.height + style.padding_v,
-            bg_color=bg_color,
+            bg_color=style.background_color or None,
             stroke_color=stroke_color,
-            fill=fill,
-            stroke=stroke,
         )
 
     @property
     def _height(self):
         """Returns the table height"""
-        height = 0
-        for r_idx, row in enumerate(self._rows):
-            style = self._get_row_style(r_idx, row)
-            height += style.height + style.padding_v
-        return height
+        return self._total_height
 
 
 class Column(object):
@@ -219,11 +467,39 @@ class Column(object):
         self.style = style
         self.header_style = header_style
 
+    def format_value(self, value):
+        """
+        Format a value with the column format, a callable or a string
+        format (e.g. '%.2f')
+        """
+        if self.format is None:
+            return value
+        if callable(self.format):
+            return self.format(value)
+        return self.format % value
+
+    def format_values(self, values):
+        """Format a sequence of values in one pass"""
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            if self.format is not None and not callable(self.format):
+                return numpy.char.mod(self.format, values).tolist()
+            values = values.tolist()
+        if self.format is None:
+            return values
+        if callable(self.format):
+            return map(self.format, values)
+        return [self.format % value for value in values]
+
 
 class Row(object):
+    __slots__ = ('values', 'title', 'style')
 
-    def __init__(self, content, title=None, style=None):
+    def __init__(self, values, title=None, style=None):
+        self.values = values
         self.title = title
         self.style = style
-        for key in content:
-            setattr(self, key, content[key])
+
+
+def _constant(value):
+    """Return a function that always return the given value"""
+    return lambda *args: value
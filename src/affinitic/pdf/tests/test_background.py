@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+affinitic.pdf
+-------------
+
+Created by mpeeters
+:copyright: (c) 2015 by Affinitic SPRL
+:license: GPL, see LICENCE.txt for more details.
+"""
+
+from cStringIO import StringIO
+from pyPdf import PdfFileReader
+from reportlab.pdfgen.canvas import Canvas
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest2
+
+from affinitic.pdf.background import BackgroundFile
+from affinitic.pdf.cache import LRUCache
+from affinitic.pdf.pdf import OutputBuffer
+from affinitic.pdf.pdf import Pdf
+
+
+class TestBackgroundFile(unittest2.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'background.pdf')
+        self._create_background(self.path, ['First', 'Following', 'Last'])
+        self.cache = LRUCache(maxsize=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _create_background(self, path, texts):
+        canvas = Canvas(path, pageCompression=1)
+        for text in texts:
+            canvas.rect(10, 10, 100, 50, fill=1)
+            canvas.drawString(20, 20, text)
+            canvas.showPage()
+        canvas.save()
+
+    def _forms(self, page):
+        forms = [o.getObject() for o in
+                 page['/Resources']['/XObject'].values()]
+        return [f for f in forms if f['/Subtype'] == '/Form']
+
+    def test_get(self):
+        """Test BackgroundFile.get(cls, filepath, cache=None)"""
+        background = BackgroundFile.get(self.path, cache=self.cache)
+        self.assertEqual(3, background.page_count)
+        self.assertTrue(
+            background is BackgroundFile.get(self.path, cache=self.cache))
+        # A modification time change without modification of the content
+        os.utime(self.path, (0, 0))
+        self.assertTrue(
+            background is BackgroundFile.get(self.path, cache=self.cache))
+        self._create_background(self.path, ['Other'])
+        other = BackgroundFile.get(self.path, cache=self.cache)
+        self.assertFalse(background is other)
+        self.assertEqual(1, other.page_count)
+        self.assertNotEqual(background.digest, other.digest)
+
+    def test_get_mmap(self):
+        """Test BackgroundFile.get(cls, filepath, cache=None) with a memory
+        mapped file"""
+        threshold = BackgroundFile.mmap_threshold
+        BackgroundFile.mmap_threshold = 0
+        try:
+            background = BackgroundFile.get(self.path, cache=self.cache)
+        finally:
+            BackgroundFile.mmap_threshold = threshold
+        self.assertEqual(
+            BackgroundFile.get(self.path, cache=LRUCache()).digest,
+            background.digest,
+        )
+        canvas = Canvas(None)
+        background.page(2).draw(canvas)
+        page = PdfFileReader(StringIO(canvas.getpdfdata())).getPage(0)
+        self.assertTrue('Last' in self._forms(page)[0].getData())
+
+    def test_page(self):
+        """Test BackgroundFile.page(self, number)"""
+        background = BackgroundFile.get(self.path, cache=self.cache)
+        form = background.page(1)
+        self.assertTrue(form is background.page(1))
+        self.assertNotEqual(form.name, background.page(0).name)
+        self.assertRaises(ValueError, background.page, 3)
+
+    def test_page_threads(self):
+        """Test BackgroundFile.page(self, number)"""
+        self._create_background(self.path,
+                                ['Page %s' % i for i in range(20)])
+        reference = BackgroundFile(self.path)
+        contents = [reference.page(i).content for i in range(20)]
+        errors = []
+
+        def load(background, numbers):
+            try:
+                for number in numbers:
+                    if background.page(number).content != contents[number]:
+                        errors.append(number)
+            except Exception as e:
+                errors.append(e)
+
+        interval = sys.getcheckinterval()
+        sys.setcheckinterval(1)
+        try:
+            for attempt in range(3):
+                background = BackgroundFile(self.path)
+                threads = [threading.Thread(
+                    target=load,
+                    args=(background, range(20)[::i % 2 and 1 or -1]),
+                ) for i in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        finally:
+            sys.setcheckinterval(interval)
+        self.assertEqual([], errors)
+
+    def test_draw(self):
+        """Test BackgroundForm.draw(self, canvas, index=None)"""
+        form = BackgroundFile.get(self.path, cache=self.cache).page(0)
+        for i in range(2):
+            canvas = Canvas(None)
+            canvas.drawString(20, 20, 'Content')
+            form.draw(canvas, index=0)
+            self.assertEqual('q', canvas._code[0])
+            canvas.showPage()
+            form.draw(canvas)
+            content = canvas.getpdfdata()
+            self.assertEqual(1, content.count('/Subtype /Form'))
+            page = PdfFileReader(StringIO(content)).getPage(0)
+            data = self._forms(page)[0].getData()
+            self.assertTrue('First' in data)
+            self.assertEqual(
+                ['/F1'],
+                self._forms(page)[0]['/Resources']['/Font'].keys(),
+            )
+
+    def _background_texts(self, content):
+        reader = PdfFileReader(StringIO(content))
+        texts = []
+        for page in reader.pages:
+            data = page.getContents().getData()
+            self.assertTrue(data.index(' Do') < data.index('(Content)'))
+            form = self._forms(page)[0].getData()
+            texts.append(form[form.index('(') + 1:form.index(')')])
+        return texts
+
+    def test_define_background(self):
+        """Test Pdf.define_background(self, filepath, page=0,
+        first_page=None, last_page=None)"""
+        pdf = Pdf(background_cache=self.cache)
+        pdf.define_background(self.path, page=1, first_page=0, last_page=2)
+        for i in range(3):
+            pdf.add_paragraph('Content')
+            pdf.add_page_break()
+        pdf.add_paragraph('Content')
+        self.assertEqual(['First', 'Following', 'Following', 'Last'],
+                         self._background_texts(pdf.content))
+
+    def test_define_background_single_page(self):
+        """Test Pdf.define_background(self, filepath, page=0,
+        first_page=None, last_page=None)"""
+        pdf = Pdf(background_cache=self.cache)
+        pdf.define_background(self.path, page=1, first_page=0, last_page=2)
+        pdf.add_paragraph('Content')
+        self.assertEqual(['First'], self._background_texts(pdf.content))
+        pdf = Pdf(background_cache=self.cache)
+        pdf.define_background(self.path, page=1)
+        pdf.add_paragraph('Content')
+        self.assertEqual(['Following'], self._background_texts(pdf.content))
+
+    def test_define_background_streaming(self):
+        """Test Pdf.define_background(self, filepath, page=0,
+        first_page=None, last_page=None) with Pdf.write_stream"""
+        pdf = Pdf(background_cache=self.cache)
+        pdf.define_background(self.path, page=1, first_page=0, last_page=2)
+
+        def content():
+            for i in range(3):
+                pdf.add_paragraph('Content')
+                pdf.add_page_break()
+                yield
+            pdf.add_paragraph('Content')
+
+        output = OutputBuffer()
+        pdf.write_stream(output, content())
+        self.assertEqual(['First', 'Following', 'Following', 'Last'],
+                         self._background_texts(output.getvalue()))
+
+    def test_define_background_streaming_page_end(self):
+        """Test Pdf.define_background(self, filepath, page=0,
+        first_page=None, last_page=None) with the last page detected while
+        Pdf.write_stream is in progress"""
+        pdf = Pdf(background_cache=self.cache)
+        pdf.define_background(self.path, page=1, first_page=0, last_page=2)
+        page_ends = []
+        end_page = pdf._document._page_end
+
+        def page_end(canvas, document):
+            page_ends.append(canvas.getPageNumber())
+            end_page(canvas, document)
+            page_ends.pop()
+
+        def content():
+            for i in range(3):
+                # The content is never added while a page is ended
+                self.assertEqual([], page_ends)
+                pdf.add_paragraph('Content')
+                pdf.add_page_break()
+                yield
+            pdf.add_paragraph('Content')
+
+        pdf._document._page_end = page_end
+        output = OutputBuffer()
+        pdf.write_stream(output, content())
+        self.assertEqual(['First', 'Following', 'Following', 'Last'],
+                         self._background_texts(output.getvalue()))
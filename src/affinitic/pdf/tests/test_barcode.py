@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+affinitic.pdf
+-------------
+
+Created by mpeeters
+:copyright: (c) 2015 by Affinitic SPRL
+:license: GPL, see LICENCE.txt for more details.
+"""
+
+from reportlab.pdfgen.canvas import Canvas
+import unittest2
+
+from affinitic.pdf.barcode import BarcodeForm
+from affinitic.pdf.cache import LRUCache
+
+
+class TestBarcodeForm(unittest2.TestCase):
+
+    def test_get(self):
+        """Test BarcodeForm.get(cls, value, barHeight=None, barWidth=0.75,
+        cache=None)"""
+        cache = LRUCache(maxsize=2)
+        barcode = BarcodeForm.get('123', cache=cache)
+        self.assertTrue(barcode is BarcodeForm.get('123', cache=cache))
+        other = BarcodeForm.get('123', barHeight=20, cache=cache)
+        self.assertFalse(barcode is other)
+        self.assertNotEqual(barcode.name, other.name)
+        self.assertEqual(20, other.bounds[3])
+        self.assertEqual(1, cache.hits)
+
+    def test_draw(self):
+        """Test BarcodeForm.draw(self, canvas, x, y)"""
+        canvas = Canvas(None)
+        barcode = BarcodeForm('123')
+        barcode.draw(canvas, 10, 20)
+        self.assertTrue(canvas.hasForm(barcode.name))
+        barcode.draw(canvas, 10, 50)
+        code = '\n'.join(canvas._code)
+        self.assertEqual(2, code.count(' Do'))
+        self.assertEqual(0, code.count(' re '))
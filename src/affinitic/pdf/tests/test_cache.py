@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+affinitic.pdf
+-------------
+
+Created by mpeeters
+:copyright: (c) 2015 by Affinitic SPRL
+:license: GPL, see LICENCE.txt for more details.
+"""
+
+import sys
+import threading
+import unittest2
+
+from affinitic.pdf import cache
+
+
+class TestLRUCache(unittest2.TestCase):
+
+    def test_init_wrong_size(self):
+        """Test LRUCache.__init__(self, maxsize=128)"""
+        self.assertRaises(ValueError, cache.LRUCache, 0)
+
+    def test_get_set(self):
+        """Test LRUCache.get(self, key, default=None)"""
+        lru = cache.LRUCache(maxsize=2)
+        lru.set('a', 1)
+        self.assertEqual(1, lru.get('a'))
+        self.assertEqual(None, lru.get('b'))
+        self.assertEqual(2, lru.get('b', 2))
+        self.assertEqual(1, lru.hits)
+        self.assertEqual(2, lru.misses)
+
+    def test_eviction(self):
+        """Test LRUCache.set(self, key, value)"""
+        lru = cache.LRUCache(maxsize=2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertTrue('a' in lru)
+        self.assertFalse('b' in lru)
+        self.assertTrue('c' in lru)
+        self.assertEqual(1, lru.evictions)
+        self.assertEqual(2, len(lru))
+
+    def test_resize(self):
+        """Test LRUCache.resize(self, maxsize)"""
+        lru = cache.LRUCache(maxsize=3)
+        for key in 'abc':
+            lru.set(key, 1)
+        lru.get('a')
+        lru.resize(2)
+        self.assertEqual(['a', 'c'], sorted(lru._data.keys()))
+        self.assertEqual(1, lru.evictions)
+        lru.resize(4)
+        lru.set('d', 1)
+        self.assertEqual(3, len(lru))
+        self.assertEqual(4, lru.info()['maxsize'])
+        self.assertRaises(ValueError, lru.resize, 0)
+
+    def test_set_existing(self):
+        """Test LRUCache.set(self, key, value)"""
+        lru = cache.LRUCache(maxsize=2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.set('a', 3)
+        lru.set('c', 4)
+        self.assertEqual(3, lru.get('a'))
+        self.assertFalse('b' in lru)
+
+    def test_pop(self):
+        """Test LRUCache.pop(self, key, default=None)"""
+        lru = cache.LRUCache(maxsize=2)
+        lru.set('a', 1)
+        self.assertEqual(1, lru.pop('a'))
+        self.assertEqual(None, lru.pop('a'))
+        self.assertEqual(0, len(lru))
+
+    def test_info(self):
+        """Test LRUCache.info(self)"""
+        lru = cache.LRUCache(maxsize=1)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('b')
+        self.assertEqual(
+            {'hits': 1, 'misses': 0, 'evictions': 1, 'size': 1, 'maxsize': 1},
+            lru.info(),
+        )
+        lru.clear()
+        self.assertEqual(0, lru.info()['size'])
+        self.assertEqual(0, lru.info()['evictions'])
+
+    def test_threads(self):
+        """Test LRUCache.get(self, key, default=None) and
+        LRUCache.set(self, key, value) from several threads"""
+        lru = cache.LRUCache(maxsize=16)
+        errors = []
+
+        def worker(offset):
+            try:
+                for i in range(3000):
+                    key = (i + offset) % 64
+                    lru.set(key, i)
+                    lru.get((key + 1) % 64)
+                    if not i % 7:
+                        lru.pop(key)
+            except Exception as e:
+                errors.append(e)
+
+        interval = sys.getcheckinterval()
+        sys.setcheckinterval(1)
+        try:
+            threads = [threading.Thread(target=worker, args=(i * 5, ))
+                       for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setcheckinterval(interval)
+        self.assertEqual([], errors)
+        self.assertEqual(8 * 3000, lru.hits + lru.misses)
+        # The usage list contains exactly the cached keys
+        keys = []
+        link = lru._root[cache._NEXT]
+        while link is not lru._root:
+            keys.append(link[cache._KEY])
+            link = link[cache._NEXT]
+        self.assertEqual(sorted(lru._data.keys()), sorted(keys))
+        self.assertTrue(len(keys) <= 16)
@@ -89,3 +89,42 @@ class TestCursor(unittest2.TestCase):
         position = cursor.real_position
         self.assertEqual(10, position.x)
         self.assertEqual(20, position.y)
+
+    def test_apply_changes(self):
+        """Test Cursor._apply_changes(self, x, y)"""
+        cursor = self.cursor
+        cursor.move(x=5, y=10)
+        cursor.move(x=-2, y=-4)
+        cursor.move_to(x=100, y=100)
+        self.assertEqual((7, 26), cursor._apply_changes(10, 20))
+        cursor._track_changes()
+        self.assertEqual((10, 20), cursor._apply_changes(10, 20))
+
+    def test_checkpoint_restore(self):
+        """Test Cursor.checkpoint(self) and Cursor.restore(self)"""
+        cursor = self.cursor
+        cursor.move_to(x=10, y=20)
+        cursor.indent(5)
+        cursor.checkpoint()
+        cursor.move(x=3, y=4)
+        cursor.checkpoint()
+        cursor.new_line()
+        cursor.move(y=6)
+        cursor.restore()
+        self.assertEqual(18, cursor.x)
+        self.assertEqual(-24, cursor.y)
+        self.assertEqual((-3, 4), cursor._apply_changes(0, 0))
+        cursor.restore()
+        self.assertEqual(15, cursor.x)
+        self.assertEqual(-20, cursor.y)
+        self.assertEqual((0, 0), cursor._apply_changes(0, 0))
+        self.assertRaises(ValueError, cursor.restore)
+
+    def test_discard(self):
+        """Test Cursor.discard(self)"""
+        cursor = self.cursor
+        cursor.checkpoint()
+        cursor.move(x=3)
+        cursor.discard()
+        self.assertEqual(3, cursor.x)
+        self.assertRaises(ValueError, cursor.discard)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+affinitic.pdf
+-------------
+
+Created by mpeeters
+:copyright: (c) 2015 by Affinitic SPRL
+:license: GPL, see LICENCE.txt for more details.
+"""
+
+import sys
+import threading
+import unittest2
+
+from affinitic.pdf import cursor
+from affinitic.pdf import displaylist
+from affinitic.pdf.examples.displaylist import tuple_nbytes
+
+
+def draw_text(flowable, text):
+    flowable.calls.append((text, flowable.cursor.x, flowable.cursor.y))
+
+
+def draw_line(flowable, color=None):
+    flowable.calls.append((color, flowable.cursor.x, flowable.cursor.y))
+
+
+class FakeFlowable(object):
+
+    def __init__(self):
+        self.calls = []
+        self.cursor = cursor.Cursor()
+
+
+class TestDisplayList(unittest2.TestCase):
+
+    def test_counts(self):
+        """Test DisplayList.counts(self)"""
+        elements = displaylist.DisplayList()
+        self.assertEqual(0, len(elements))
+        self.assertEqual({}, elements.counts())
+        for i in range(3):
+            elements.append(draw_text, ('a', ), {}, 0, i)
+        elements.append(draw_line, (), {}, 0, 3)
+        self.assertEqual(4, len(elements))
+        self.assertEqual({'draw_text': 3, 'draw_line': 1}, elements.counts())
+
+    def test_opcode(self):
+        """Test DisplayList.opcode(cls, method)"""
+        code = displaylist.DisplayList.opcode(draw_text)
+        self.assertEqual(code, displaylist.DisplayList.opcode(draw_text))
+        self.assertNotEqual(code, displaylist.DisplayList.opcode(draw_line))
+
+    def test_opcode_threads(self):
+        """Test DisplayList.opcode(cls, method)"""
+        interval = sys.getcheckinterval()
+        sys.setcheckinterval(1)
+        try:
+            for attempt in range(10):
+                methods = [lambda flowable: None for i in range(1000)]
+                codes = []
+
+                def register():
+                    codes.append([displaylist.DisplayList.opcode(m)
+                                  for m in methods])
+
+                threads = [threading.Thread(target=register)
+                           for i in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                self.assertEqual(1, len(set([tuple(c) for c in codes])))
+                for method, code in zip(methods, codes[0]):
+                    self.assertTrue(
+                        displaylist.DisplayList._methods[code] is method)
+        finally:
+            sys.setcheckinterval(interval)
+
+    def test_flowable_opcodes(self):
+        """Test DisplayList.opcode(cls, method)"""
+        from affinitic.pdf.flowable import ExtendedFlowable
+        count = len(displaylist.DisplayList._methods)
+        flowable = ExtendedFlowable(1)
+        flowable.draw_paragraph('a')
+        flowable.draw_h_line(10)
+        self.assertEqual(2, len(flowable.elements))
+        self.assertEqual(count, len(displaylist.DisplayList._methods))
+
+    def test_append_kwargs(self):
+        """Test DisplayList.append(self, method, args, kwargs, x, y)"""
+        elements = displaylist.DisplayList()
+        elements.append(draw_line, (), {'color': 'red'}, 0, 0)
+        elements.append(draw_line, (), {}, 0, 0)
+        elements.append(draw_line, (), {'color': 'blue'}, 0, 0)
+        self.assertEqual([0, 2], sorted(elements._kwargs.keys()))
+        self.assertTrue(elements._kwargs[0][0] is elements._kwargs[2][0])
+
+    def test_nbytes(self):
+        """Test DisplayList.nbytes(self)"""
+        elements = displaylist.DisplayList()
+        empty = elements.nbytes()
+        for i in range(1000):
+            elements.append(draw_text, ('a', ), {}, 0, i)
+        per_element = (elements.nbytes() - empty) / 1000.
+        # The opcode, the packed position, the list slot and the arguments
+        expected = 2 + 16 + 8 + sys.getsizeof(('a', ))
+        self.assertTrue(expected <= per_element < expected * 1.1)
+        # The same elements recorded as tuples (examples/displaylist.py)
+        self.assertTrue(elements.nbytes() * 4 < tuple_nbytes(elements))
+
+    def test_replay(self):
+        """Test DisplayList.replay(self, flowable, cursor)"""
+        flowable = FakeFlowable()
+        elements = displaylist.DisplayList()
+        elements.append(draw_text, ('a', ), {}, 10, 5)
+        elements.append(draw_text, (), {'text': 'b'}, 10, 5)
+        elements.append(draw_line, (), {'color': 'red'}, 20, 15)
+        elements.replay(flowable, flowable.cursor)
+        self.assertEqual([('a', 10, -5), ('b', 10, -5), ('red', 20, -15)],
+                         flowable.calls)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+affinitic.pdf
+-------------
+
+Created by mpeeters
+:copyright: (c) 2015 by Affinitic SPRL
+:license: GPL, see LICENCE.txt for more details.
+"""
+
+import unittest2
+
+from affinitic.pdf import flowable
+from affinitic.pdf.tools import ColorRGB
+
+
+class FakeCanvas(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def setStrokeColor(self, color):
+        self.calls.append(('stroke', color))
+
+    def setFillColor(self, color):
+        self.calls.append(('fill', color))
+
+
+class TestGraphicsState(unittest2.TestCase):
+
+    def test_set_stroke_color(self):
+        """Test GraphicsState.set_stroke_color(self, color)"""
+        canvas = FakeCanvas()
+        state = flowable.GraphicsState(canvas)
+        red = ColorRGB(255, 0, 0)
+        state.set_stroke_color(red)
+        state.set_stroke_color(ColorRGB(255, 0, 0))
+        state.set_stroke_color(ColorRGB(0, 0, 0))
+        state.set_stroke_color(red)
+        self.assertEqual(
+            ['stroke'] * 3,
+            [c[0] for c in canvas.calls],
+        )
+        self.assertTrue(canvas.calls[0][1] is red.rgb)
+
+    def test_set_fill_color(self):
+        """Test GraphicsState.set_fill_color(self, color)"""
+        canvas = FakeCanvas()
+        state = flowable.GraphicsState(canvas)
+        state.set_fill_color(ColorRGB(255, 0, 0))
+        state.set_stroke_color(ColorRGB(255, 0, 0))
+        state.set_fill_color(ColorRGB(255, 0, 0))
+        self.assertEqual(['fill', 'stroke'], [c[0] for c in canvas.calls])
+
+
+class TestRectangleBatch(unittest2.TestCase):
+
+    def _canvas(self):
+        from reportlab.pdfgen.canvas import Canvas
+        return Canvas(None)
+
+    def test_merge_segments(self):
+        """Test _merge_segments(segments, tolerance=0.001)"""
+        self.assertEqual(
+            [[0, 20], [25, 30]],
+            flowable._merge_segments([(10, 20), (25, 30), (0, 10.0001)]),
+        )
+        self.assertEqual([[0, 20]], flowable._merge_segments([(0, 20),
+                                                              (5, 10)]))
+
+    def test_flush_shared_edges(self):
+        """Test RectangleBatch.flush(self) with adjacent cells"""
+        canvas = self._canvas()
+        canvas._code.append('% before')
+        batch = flowable.RectangleBatch(canvas)
+        black = ColorRGB(0, 0, 0)
+        red = ColorRGB(255, 0, 0)
+        for column in range(3):
+            for row in range(2):
+                batch.add(column * 10, -row * 5, 10, 5, fill_color=red,
+                          stroke_color=black)
+        canvas._code.append('% after')
+        batch.flush()
+        code = canvas._code
+        self.assertEqual('% before', code[0])
+        self.assertEqual('% after', code[-1])
+        content = '\n'.join(code[1:-1])
+        # One fill path with a rectangle per row and one stroke path with
+        # a line for each row and column boundary
+        self.assertEqual(1, code.count('f'))
+        self.assertEqual(2, content.count(' re'))
+        self.assertEqual(1, code.count('S'))
+        self.assertEqual(3 + 4, content.count(' m'))
+        self.assertEqual(None, batch.index)
+
+    def test_flush_colors(self):
+        """Test RectangleBatch.flush(self) with several colors"""
+        canvas = self._canvas()
+        batch = flowable.RectangleBatch(canvas)
+        batch.add(0, 0, 10, 5, fill_color=ColorRGB(255, 0, 0))
+        batch.add(10, 0, 10, 5, fill_color=ColorRGB(0, 255, 0))
+        batch.add(20, 0, 10, 5, fill_color=ColorRGB(255, 0, 0))
+        batch.flush()
+        content = '\n'.join(canvas._code)
+        self.assertEqual(3, content.count(' re'))
+        self.assertEqual(0, canvas._code.count('S'))
+        self.assertEqual(2, content.count(' rg'))
+
+    def test_flush_empty(self):
+        """Test RectangleBatch.flush(self) without rectangles"""
+        canvas = self._canvas()
+        count = len(canvas._code)
+        flowable.RectangleBatch(canvas).flush()
+        self.assertEqual(count, len(canvas._code))
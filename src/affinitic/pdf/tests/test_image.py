@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+affinitic.pdf
+-------------
+
+Created by mpeeters
+:copyright: (c) 2015 by Affinitic SPRL
+:license: GPL, see LICENCE.txt for more details.
+"""
+
+from PIL import Image
+import os
+import shutil
+import tempfile
+import unittest2
+
+from affinitic.pdf.cache import LRUCache
+from affinitic.pdf.image import ImageRegistry
+from affinitic.pdf.pdf import Pdf
+
+
+class TestImageRegistry(unittest2.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = LRUCache(maxsize=2)
+        image = Image.new('RGB', (300, 150), (200, 10, 10))
+        for name in ('a.png', 'b.png', 'a.jpg'):
+            image.save(self.path(name))
+        image.resize((3000, 1500)).save(self.path('big.jpg'))
+        os.mkdir(self.path('cache'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, *names):
+        return os.path.join(self.directory, *names)
+
+    def test_register(self):
+        """Test ImageRegistry.register(self, path)"""
+        registry = ImageRegistry(cache=self.cache)
+        image = registry.register(self.path('a.png'))
+        self.assertEqual((300, 150), (image.width, image.height))
+        self.assertEqual((72., 36.), image.size)
+        self.assertTrue(image is registry.register(self.path('a.png')))
+        self.assertTrue(image is registry.register(self.path('b.png')))
+        self.assertFalse(image is registry.register(self.path('a.jpg')))
+        self.assertEqual(2, len(registry))
+        self.assertEqual(2, self.cache.misses)
+
+    def test_register_shared_cache(self):
+        """Test ImageRegistry.register(self, path)"""
+        image = ImageRegistry(cache=self.cache).register(self.path('a.png'))
+        registry = ImageRegistry(cache=self.cache)
+        self.assertTrue(image is registry.register(self.path('b.png')))
+        self.assertEqual(1, self.cache.hits)
+
+    def test_register_resampled(self):
+        """Test ImageRegistry.register_resampled(self, path, dpi, width=None,
+        height=None)"""
+        registry = ImageRegistry(cache=self.cache,
+                                 cache_dir=self.path('cache'))
+        image, width, height = registry.register_resampled(
+            self.path('big.jpg'), 150, width=72, height=36)
+        self.assertEqual((150, 75), (image.width, image.height))
+        self.assertEqual((72, 36), (width, height))
+        files = os.listdir(self.path('cache'))
+        self.assertEqual(1, len(files))
+        self.assertTrue(files[0].endswith('-150x75.jpg'))
+
+        registry = ImageRegistry(cache_dir=self.path('cache'))
+        mtime = os.path.getmtime(self.path('cache', files[0]))
+        image, width, height = registry.register_resampled(
+            self.path('big.jpg'), 150, width=72, height=36)
+        self.assertEqual((150, 75), (image.width, image.height))
+        self.assertEqual(
+            mtime, os.path.getmtime(self.path('cache', files[0])))
+
+    def test_register_resampled_passthrough(self):
+        """Test ImageRegistry.register_resampled(self, path, dpi, width=None,
+        height=None)"""
+        registry = ImageRegistry(cache=self.cache,
+                                 cache_dir=self.path('cache'))
+        image, width, height = registry.register_resampled(
+            self.path('a.jpg'), 300)
+        self.assertEqual((72., 36.), (width, height))
+        self.assertTrue(image is registry.register(self.path('a.jpg')))
+        self.assertEqual([], os.listdir(self.path('cache')))
+
+    def test_cache_dir_created_concurrently(self):
+        """Test ImageRegistry.cache_dir"""
+        isdir = os.path.isdir
+        # The directory is created by another process after the check
+        os.path.isdir = lambda path: False
+        try:
+            registry = ImageRegistry(cache_dir=self.path('cache'))
+            self.assertEqual(self.path('cache'), registry.cache_dir)
+            registry = ImageRegistry(cache_dir=self.path('a.png', 'cache'))
+            self.assertRaises(OSError, getattr, registry, 'cache_dir')
+        finally:
+            os.path.isdir = isdir
+
+    def test_pdf_add_image(self):
+        """Test Pdf.add_image(self, img_path, width=None, height=None)"""
+        pdf = Pdf(image_cache=self.cache)
+        pdf.add_image(self.path('a.png'))
+        pdf.add_image(self.path('b.png'), width=20, height=10)
+        pdf.add_image(self.path('a.jpg'))
+        content = pdf.content
+        self.assertEqual(2, content.count('/Subtype /Image'))
+        self.assertEqual(2, len(pdf._images))
+
+    def test_pdf_add_image_dpi(self):
+        """Test Pdf.add_image(self, img_path, width=None, height=None,
+        dpi=None)"""
+        pdf = Pdf(image_dpi=100, image_cache_dir=self.path('cache'))
+        pdf.add_image(self.path('big.jpg'), width=72, height=36)
+        pdf.add_image(self.path('big.jpg'), width=144, height=72, dpi=50)
+        self.assertEqual([(100, 50)], [(i.width, i.height)
+                                       for i in pdf._images._images.values()])
+        self.assertEqual(1, len(os.listdir(self.path('cache'))))
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+affinitic.pdf
+-------------
+
+Created by mpeeters
+:copyright: (c) 2015 by Affinitic SPRL
+:license: GPL, see LICENCE.txt for more details.
+"""
+
+from cStringIO import StringIO
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.pagesizes import landscape
+from reportlab.lib.pagesizes import portrait
+from reportlab.lib.units import mm
+from reportlab.platypus import SimpleDocTemplate
+import unittest2
+
+from affinitic.pdf.cache import LRUCache
+from affinitic.pdf.measurement import MeasurementContext
+
+
+class TestMeasurementContext(unittest2.TestCase):
+
+    def test_geometry(self):
+        """Test MeasurementContext.__init__(self, format, orientation,
+        margins, unit)"""
+        context = MeasurementContext(A4, landscape, [15, 10, 20, 5], mm)
+        document = SimpleDocTemplate(
+            StringIO(),
+            pagesize=landscape(A4),
+            topMargin=13 * mm,
+            rightMargin=12 * mm,
+            bottomMargin=22 * mm,
+            leftMargin=3 * mm,
+        )
+        document.build([])
+        frame = document.pageTemplate.frames[0]
+        self.assertEqual(document.width, context.width)
+        self.assertEqual(document.height, context.height)
+        self.assertEqual(
+            (frame._x1, frame._y1, frame.width, frame.height),
+            (context.frame._x1, context.frame._y1, context.frame.width,
+             context.frame.height),
+        )
+
+    def test_get(self):
+        """Test MeasurementContext.get(cls, format, orientation, margins,
+        unit, cache=None)"""
+        cache = LRUCache(maxsize=2)
+        context = MeasurementContext.get(A4, portrait, [10] * 4, mm,
+                                         cache=cache)
+        self.assertTrue(context is MeasurementContext.get(
+            A4, portrait, (10, 10, 10, 10), mm, cache=cache))
+        self.assertFalse(context is MeasurementContext.get(
+            A4, landscape, [10] * 4, mm, cache=cache))
+        self.assertEqual(1, cache.hits)
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+affinitic.pdf
+-------------
+
+Created by mpeeters
+:copyright: (c) 2015 by Affinitic SPRL
+:license: GPL, see LICENCE.txt for more details.
+"""
+
+import unittest2
+
+from affinitic.pdf.pagination import PaginationPlan
+
+
+class TestPaginationPlan(unittest2.TestCase):
+
+    def test_cumulative(self):
+        """Test PaginationPlan.cumulative"""
+        plan = PaginationPlan([1, 2, 3], [1, 2, 3], 100)
+        self.assertEqual([0, 1, 3, 6], plan.cumulative)
+
+    def test_breaks(self):
+        """Test PaginationPlan.breaks"""
+        plan = PaginationPlan([10] * 10, [10] * 10, 35)
+        self.assertEqual([3, 6, 9], plan.breaks)
+        self.assertEqual(4, plan.page_count)
+        self.assertEqual([(0, 3), (3, 6), (6, 9), (9, 10)], plan.pages)
+        self.assertEqual(10, plan.end_height)
+
+    def test_breaks_start_height(self):
+        """Test PaginationPlan.breaks"""
+        plan = PaginationPlan([10] * 4, [10] * 4, 35, start_height=20)
+        self.assertEqual([1], plan.breaks)
+        plan = PaginationPlan([10] * 4, [10] * 4, 35, start_height=30)
+        self.assertEqual([0, 3], plan.breaks)
+
+    def test_breaks_check_heights(self):
+        """Test PaginationPlan.breaks"""
+        plan = PaginationPlan([10, 10, 10, 10], [10, 10, 30, 10], 35)
+        self.assertEqual([2], plan.breaks)
+        plan = PaginationPlan([10, 20, 10, 10], [10, 5, 10, 10], 35)
+        self.assertEqual([2], plan.breaks)
+        self.assertEqual(20, plan.end_height)
+
+    def test_breaks_higher_than_page(self):
+        """Test PaginationPlan.breaks"""
+        plan = PaginationPlan([10, 50, 10], [10, 50, 10], 35)
+        self.assertEqual([1, 2], plan.breaks)
+
+    def test_no_rows(self):
+        """Test PaginationPlan.breaks"""
+        plan = PaginationPlan([], [], 35, start_height=5)
+        self.assertEqual([], plan.breaks)
+        self.assertEqual(1, plan.page_count)
+        self.assertEqual(5, plan.end_height)
+
+    def test_page_of(self):
+        """Test PaginationPlan.page_of(self, index)"""
+        plan = PaginationPlan([10] * 10, [10] * 10, 35)
+        self.assertEqual(0, plan.page_of(0))
+        self.assertEqual(0, plan.page_of(2))
+        self.assertEqual(1, plan.page_of(3))
+        self.assertEqual(3, plan.page_of(9))
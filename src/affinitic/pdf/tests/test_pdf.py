@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+affinitic.pdf
+-------------
+
+Created by mpeeters
+:copyright: (c) 2015 by Affinitic SPRL
+:license: GPL, see LICENCE.txt for more details.
+"""
+
+from cStringIO import StringIO
+from pyPdf import PdfFileReader
+from reportlab import rl_config
+import unittest2
+
+from affinitic.pdf.cache import LRUCache
+from affinitic.pdf.element import Footer
+from affinitic.pdf.element import Header
+from affinitic.pdf.pdf import OutputBuffer
+from affinitic.pdf.pdf import Pdf
+from affinitic.pdf.style import Style
+from affinitic.pdf.style import StyleLibrary
+
+
+class TestPdf(unittest2.TestCase):
+
+    def setUp(self):
+        library = StyleLibrary()
+        library.define('big', Style(font_size=20))
+        self.cache = LRUCache(maxsize=2)
+        self.pdf = Pdf(styles=library, measurement_cache=self.cache)
+
+    def test_simulate_paragraph_size_cache(self):
+        """Test Pdf.simulate_paragraph_size(self, text, style, width,
+        height)"""
+        size = self.pdf.simulate_paragraph_size('Paid', width=20)
+        self.assertEqual(size, self.pdf.simulate_paragraph_size('Paid',
+                                                                width=20))
+        self.assertEqual({'hits': 1, 'misses': 1, 'evictions': 0,
+                          'size': 1, 'maxsize': 2}, self.cache.info())
+
+    def test_simulate_paragraph_size_cache_key(self):
+        """Test Pdf.simulate_paragraph_size(self, text, style, width,
+        height)"""
+        small = self.pdf.simulate_paragraph_size('Paid', width=20)
+        big = self.pdf.simulate_paragraph_size('Paid', 'big', width=20)
+        self.pdf.simulate_paragraph_size('Paid', width=30)
+        self.assertTrue(big[1] > small[1])
+        self.assertEqual(3, self.cache.misses)
+        self.assertEqual(1, self.cache.evictions)
+
+    def test_simulate_paragraph_size_shared_cache(self):
+        """Test Pdf.simulate_paragraph_size(self, text, style, width,
+        height)"""
+        self.pdf.simulate_paragraph_size('EUR', width=20)
+        pdf = Pdf(measurement_cache=self.cache)
+        pdf.simulate_paragraph_size('EUR', width=20)
+        self.assertEqual(1, self.cache.hits)
+
+    def test_measurement_context(self):
+        """Test Pdf.__init__ measurement context and lazy document"""
+        other = Pdf()
+        self.assertTrue(
+            self.pdf._measurement_context is other._measurement_context)
+        self.pdf.simulate_paragraph_size('Paid')
+        self.assertEqual(190, round(self.pdf.width, 6))
+        self.assertTrue(self.pdf._doctemplate is None)
+        self.pdf.add_paragraph('Paid')
+        self.assertTrue(self.pdf.content.startswith('%PDF'))
+        self.assertFalse(self.pdf._doctemplate is None)
+
+    def test_wrap_paragraph_cache(self):
+        """Test Pdf.wrap_paragraph(self, text, style='paragraph', width=None,
+        height=None)"""
+        paragraph, width, height = self.pdf.wrap_paragraph('Paid')
+        self.assertTrue(paragraph is self.pdf.wrap_paragraph('Paid')[0])
+        # The shared cache only keeps the size of the paragraph
+        unit = self.pdf._measure_unit
+        self.assertEqual([(width * unit, height * unit)],
+                         [link[3] for link in self.cache._data.values()])
+        other = Pdf(measurement_cache=self.cache)
+        self.assertFalse(paragraph is other.wrap_paragraph('Paid')[0])
+        self.assertEqual((width, height),
+                         other.simulate_paragraph_size('Paid'))
+
+    def test_add_wrapped_paragraph_shared(self):
+        """Test Pdf.add_wrapped_paragraph(self, paragraph, paragraph_height,
+        style, width=None, height=None) with a paragraph drawn twice"""
+        paragraph, width, height = self.pdf.wrap_paragraph('Paid')
+        other = Pdf(measurement_cache=self.cache)
+        # The wrapped paragraph is never bound to the canvas of a document
+        paragraph.canv = None
+        for pdf in (self.pdf, other):
+            pdf.add_wrapped_paragraph(paragraph, height, 'paragraph')
+            pdf.add_wrapped_paragraph(paragraph, height, 'paragraph')
+            self.assertTrue(pdf.content.startswith('%PDF'))
+        self.assertTrue(paragraph.canv is None)
+
+    def _invariant_pdf(self):
+        pdf = Pdf()
+        pdf.add_paragraph('Paid')
+        return pdf
+
+    def test_write_to(self):
+        """Test Pdf.write_to(self, fileobj)"""
+        invariant = rl_config.invariant
+        rl_config.invariant = 1
+        try:
+            output = OutputBuffer()
+            self._invariant_pdf().write_to(output)
+            self.assertEqual(1, len(output._strings))
+            self.assertEqual(self._invariant_pdf().content, output.getvalue())
+        finally:
+            rl_config.invariant = invariant
+
+    def test_iter_content(self):
+        """Test Pdf.iter_content(self, chunk_size=65536)"""
+        invariant = rl_config.invariant
+        rl_config.invariant = 1
+        try:
+            chunks = list(self._invariant_pdf().iter_content(chunk_size=100))
+            content = self._invariant_pdf().content
+        finally:
+            rl_config.invariant = invariant
+        self.assertEqual(content, ''.join(chunks))
+        self.assertEqual([100] * (len(chunks) - 1),
+                         [len(c) for c in chunks[:-1]])
+
+    def _statements(self, pdf, output=None, written=None):
+        for i in range(4):
+            if written is not None:
+                written.append(len(output.getvalue()))
+            pdf.add_paragraph('Statement %s' % i)
+            pdf.add_page_break()
+            yield
+        pdf.add_paragraph('End')
+
+    def test_write_stream(self):
+        """Test Pdf.write_stream(self, fileobj, content)"""
+        output = OutputBuffer()
+        written = []
+        self.pdf.write_stream(
+            output,
+            self._statements(self.pdf, output, written),
+        )
+        # The pages are written while the content is added
+        self.assertTrue(written[1] < written[2] < written[3])
+        content = output.getvalue()
+        pages = PdfFileReader(StringIO(content)).pages
+        pdf = Pdf()
+        list(self._statements(pdf))
+        expected = PdfFileReader(StringIO(pdf.content)).pages
+        self.assertEqual(5, len(pages))
+        self.assertEqual(
+            [p.getContents().getData() for p in expected],
+            [p.getContents().getData() for p in pages],
+        )
+        xref = content[content.rindex('startxref') + 9:].split()[0]
+        # Each entry of the cross reference table points to its object
+        lines = content[int(xref):].split('\n')
+        for number in range(1, int(lines[1].split()[1])):
+            offset = int(lines[2 + number].split()[0])
+            self.assertTrue(content[offset:].startswith('%s 0 obj' % number))
+
+    def test_write_stream_single_step(self):
+        """Test Pdf.write_stream(self, fileobj, content) with the pages added
+        in a single step"""
+        output = OutputBuffer()
+        written = []
+
+        def content():
+            for i in range(4):
+                written.append(len(output.getvalue()))
+                self.pdf.add_paragraph('Statement %s' % i)
+                self.pdf.add_page_break()
+            yield
+
+        self.pdf.write_stream(output, content())
+        # The pages are written as they fill, before the end of the step
+        self.assertTrue(written[1] < written[2] < written[3])
+        pages = PdfFileReader(StringIO(output.getvalue())).pages
+        self.assertEqual(5, len(pages))
+
+    def test_add_barcode_sheet(self):
+        """Test Pdf.add_barcode_sheet(self, values, columns, rows, width,
+        height, barHeight=None, barWidth=0.75)"""
+        self.pdf.add_barcode_sheet(
+            (str(i) for i in range(5)), 2, 2, 50, 20)
+        elements = [e for e in self.pdf._story if hasattr(e, 'elements')]
+        self.assertEqual([4, 1], [len(e.elements) for e in elements])
+        positions = elements[0].elements._positions
+        self.assertEqual([0, 20, 50, 20, 0, 40, 50, 40], list(positions))
+        self.assertEqual(20, self.pdf.current_height)
+        self.assertEqual(0, self.pdf.cursor.x)
+        self.assertEqual(-20, self.pdf.cursor.y)
+
+    def test_add_barcode_sheet_wrong_grid(self):
+        """Test Pdf.add_barcode_sheet(self, values, columns, rows, width,
+        height, barHeight=None, barWidth=0.75)"""
+        self.assertRaises(ValueError, self.pdf.add_barcode_sheet,
+                          ['1'], 0, 2, 50, 20)
+        self.assertRaises(ValueError, self.pdf.add_barcode_sheet,
+                          ['1'], 2, 2, 50, self.pdf.height / 2 + 1)
+
+    def test_add_barcode_sheet_pages(self):
+        """Test Pdf.add_barcode_sheet(self, values, columns, rows, width,
+        height, barHeight=None, barWidth=0.75)"""
+        self.pdf.add_paragraph('Before')
+        height = self.pdf.height / 2
+        self.pdf.add_barcode_sheet(
+            (str(i) for i in range(5)), 1, 2, 50, height)
+        # Each grid is on its own page, the first one doesn't fit under the
+        # paragraph
+        self.assertEqual(4, self.pdf.page_number)
+        self.assertEqual(height, self.pdf.current_height)
+        content = self.pdf.content
+        self.assertEqual(4, PdfFileReader(StringIO(content)).getNumPages())
+
+    def test_add_barcode_sheet_cursor_move(self):
+        """Test Pdf.add_barcode_sheet(self, values, columns, rows, width,
+        height, barHeight=None, barWidth=0.75)"""
+        self.pdf.add_paragraph('Before')
+        height = self.pdf.height / 2
+        self.pdf.cursor.move(y=height)
+        self.pdf.add_barcode_sheet(['1', '2'], 1, 1, 50, height)
+        self.assertEqual(3, self.pdf.page_number)
+
+    def test_stamp(self):
+        """Test Pdf.stamp(self, name)"""
+        self.pdf.add_paragraph('Before')
+        height = self.pdf.current_height
+        with self.pdf.stamp('title') as stamp:
+            self.pdf.add_paragraph('Title')
+            self.pdf.add_h_line()
+        self.assertTrue(self.pdf.has_stamp('title'))
+        self.assertEqual(2, len(stamp.elements))
+        self.assertEqual(height, self.pdf.current_height)
+        self.assertEqual(1, len(self.pdf._currentElement.elements))
+        self.assertRaises(ValueError, self.pdf.stamp('title').__enter__)
+
+    def test_add_stamp(self):
+        """Test Pdf.add_stamp(self, name)"""
+        self.assertRaises(ValueError, self.pdf.add_stamp, 'title')
+        with self.pdf.stamp('title'):
+            self.pdf.add_paragraph('Title')
+        for i in range(3):
+            self.pdf.add_stamp('title')
+            self.pdf.add_page_break()
+        content = self.pdf.content
+        self.assertEqual(1, content.count('/Subtype /Form'))
+
+    def test_add_grid(self):
+        """Test Pdf.add_grid(self, size, color)"""
+        pdf = Pdf(debug=True)
+        pdf.add_paragraph('First page')
+        pdf.add_page_break()
+        stamps = [e.elements._arguments[0][0] for e in pdf._story
+                  if len(getattr(e, 'elements', ())) and
+                  e.elements.counts().keys() == ['draw_stamp']]
+        self.assertEqual(2, len(stamps))
+        self.assertTrue(stamps[0] is stamps[1])
+        self.assertEqual(1, pdf.content.count('/Subtype /Form'))
+
+
+class TestDeferredElement(unittest2.TestCase):
+
+    def test_render_static(self):
+        """Test DeferredElement.render_static(self)"""
+        class PageHeader(Header):
+
+            def render_static(self):
+                self.pdf.add_paragraph('Company')
+
+            def render(self):
+                self.pdf.add_paragraph('Page %s' % self.page_number)
+
+        pdf = Pdf(header=PageHeader)
+        pdf.add_paragraph('First page')
+        pdf.add_page_break()
+        pdf.add_paragraph('Second page')
+        self.assertEqual(3, len(pdf._story))
+        content = pdf.content
+        self.assertEqual(
+            {'draw_stamp': 1, 'draw_paragraph': 1},
+            pdf._page_renderer.header.elements.counts(),
+        )
+        self.assertEqual(1, content.count('/Subtype /Form'))
+
+    def test_render_without_static(self):
+        """Test DeferredElement._render(self)"""
+        class PageFooter(Footer):
+
+            def render(self):
+                self.pdf.add_paragraph('Page %s' % self.page_number)
+
+        pdf = Pdf(footer=PageFooter)
+        pdf.add_paragraph('First page')
+        pdf.add_page_break()
+        content = pdf.content
+        self.assertEqual({'draw_paragraph': 1},
+                         pdf._page_renderer.footer.elements.counts())
+        self.assertEqual(0, content.count('/Subtype /Form'))
+
+    def test_page_count(self):
+        """Test DeferredElement.page_count"""
+        pages = []
+
+        class PageFooter(Footer):
+
+            def render(self):
+                pages.append((self.page_number, self.page_count))
+                self.pdf.add_paragraph('Page %s of %s' % (self.page_number,
+                                                          self.page_count))
+
+        pdf = Pdf(footer=PageFooter)
+        for i in range(3):
+            pdf.add_paragraph('Content')
+            pdf.add_page_break()
+        pdf.add_paragraph('Content')
+        content = pdf.content
+        self.assertEqual([(1, 4), (2, 4), (3, 4), (4, 4)], pages)
+        self.assertEqual(4, PdfFileReader(StringIO(content)).getNumPages())
+
+    def test_page_count_streaming(self):
+        """Test DeferredElement.page_count with Pdf.write_stream"""
+        pages = []
+
+        class PageFooter(Footer):
+
+            def render(self):
+                pages.append((self.page_number, self.page_count))
+
+        pdf = Pdf(footer=PageFooter)
+
+        def content():
+            pdf.add_paragraph('Content')
+            pdf.add_page_break()
+            yield
+            pdf.add_paragraph('Content')
+
+        pdf.write_stream(OutputBuffer(), content())
+        self.assertEqual([(1, None), (2, None)], pages)
+
+    def test_reserved_height(self):
+        """Test DeferredElement.reserved_height"""
+        class PageHeader(Header):
+            reserved_height = 20
+
+        class PageFooter(Footer):
+            reserved_height = 10
+
+        pdf = Pdf(header=PageHeader, footer=PageFooter)
+        self.assertAlmostEqual(Pdf().height - 30, pdf.height)
+        self.assertAlmostEqual(Pdf().height - 20,
+                               Pdf(header=PageHeader).height)
+
+
+class TestOutputBuffer(unittest2.TestCase):
+
+    def test_getvalue(self):
+        """Test OutputBuffer.getvalue(self)"""
+        output = OutputBuffer()
+        data = 'abc' * 10
+        output.write(data)
+        self.assertTrue(output.getvalue() is data)
+        output.write('def')
+        self.assertEqual(data + 'def', output.getvalue())
+
+    def test_chunks(self):
+        """Test OutputBuffer.chunks(self, chunk_size)"""
+        output = OutputBuffer()
+        output.write('abcde')
+        output.write('fg')
+        self.assertEqual(['abc', 'de', 'fg'], list(output.chunks(3)))
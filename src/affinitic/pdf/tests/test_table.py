@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+affinitic.pdf
+-------------
+
+Created by mpeeters
+:copyright: (c) 2015 by Affinitic SPRL
+:license: GPL, see LICENCE.txt for more details.
+"""
+
+from StringIO import StringIO
+
+import gc
+import unittest2
+
+from affinitic.pdf import table as table_module
+from affinitic.pdf.displaylist import DisplayList
+from affinitic.pdf.flowable import ExtendedFlowable
+from affinitic.pdf.pdf import OutputBuffer
+from affinitic.pdf.pdf import Pdf
+from affinitic.pdf.style import ColumnStyle
+from affinitic.pdf.style import RowStyle
+from affinitic.pdf.style import StyleLibrary
+from affinitic.pdf.style import TableStyle
+from affinitic.pdf.tools import ColorRGB
+
+
+class TestTable(unittest2.TestCase):
+
+    def setUp(self):
+        self.library = StyleLibrary()
+        self.library.define('col1', ColumnStyle(width=10))
+        self.library.define('col2', ColumnStyle(width=30))
+        self.library.define('table', TableStyle(
+            border=1,
+            border_color=ColorRGB(0, 0, 0),
+            padding='1',
+        ))
+        self.library.define('row', RowStyle(height=5), inherits=['table'])
+        self.library.define(
+            'middle',
+            RowStyle(height=20, vertical_align='middle'),
+            inherits=['table'],
+        )
+        self.pdf = Pdf(styles=self.library)
+
+    def _table(self, rows, formats=(None, None)):
+        table = self.pdf.add_table('test', style='table')
+        table.add_column(style='col1', format=formats[0])
+        table.add_column(style='col2', format=formats[1])
+        for row, style in rows:
+            table.add_row(row, style=style)
+        return table
+
+    def test_add_row_wrong_length(self):
+        """Test Table.add_row(self, content, title=None, style=None)"""
+        table = self._table([])
+        self.assertRaises(ValueError, table.add_row, ['a'], style='row')
+
+    def test_height(self):
+        """Test Table._height"""
+        table = self._table([(['a', 'b'], 'row'), (['c', 'd'], 'middle')])
+        self.assertEqual(29, table._height)
+
+    def test_simulate_row_heights(self):
+        """Test Table.simulate(self)"""
+        table = self._table([
+            (['a', 'b'], 'row'),
+            (['a<br/>b<br/>c', 'd'], 'row'),
+        ])
+        table.simulate()
+
+        self.assertEqual(5, table._row_heights[0])
+        self.assertTrue(table._row_heights[1] > 5)
+        self.assertEqual(
+            table._row_heights[0] + table._row_heights[1] + 4,
+            table._height,
+        )
+        style = table._get_cell_style(1, table._columns[1], 1, table._rows[1])
+        self.assertEqual(table._row_heights[1], style.height)
+        self.assertEqual(30, style.width)
+
+    def test_simulate_vertical_align(self):
+        """Test Table.simulate(self)"""
+        table = self._table([(['a', 'b'], 'row'), (['c', 'd'], 'middle')])
+        table.simulate()
+
+        self.assertEqual([(1, 0), (1, 1)], sorted(table._cell_offsets.keys()))
+        style = table._get_cell_style(0, table._columns[0], 1, table._rows[1])
+        self.assertTrue(style.space_before > 0)
+        self.assertEqual(table._cell_offsets[(1, 0)], style.space_before)
+
+    def test_simulate_does_not_define_styles(self):
+        """Test Table.simulate(self)"""
+        styles = sorted(self.library.list())
+        table = self._table([(['a', 'b'], 'row'), (['c', 'd'], 'middle')])
+        table.render()
+        self.assertEqual(styles, sorted(self.library.list()))
+        self.assertEqual(styles, sorted(self.pdf._styles.list()))
+
+    def test_render_wrap_once(self):
+        """Test Table.render(self)"""
+        table = self._table([(['a', 'b'], 'row'), (['c', 'd'], 'middle')])
+        calls = []
+        wrap_paragraph = self.pdf.wrap_paragraph
+
+        def wrapper(*args, **kwargs):
+            calls.append(args)
+            return wrap_paragraph(*args, **kwargs)
+
+        self.pdf.wrap_paragraph = wrapper
+        table.render()
+        self.assertEqual(4, len(calls))
+        self.assertEqual([], table._measures)
+
+    def test_render_stream(self):
+        """Test Table.render_stream(self, rows, style=None)"""
+        table = self._table([(['a', 'b'], 'middle')])
+        rows = (('a%s' % i, 'b%s' % i) for i in range(200))
+        table.render_stream(rows, style='row')
+
+        self.assertEqual([], table._rows)
+        self.assertEqual([], table._measures)
+        self.assertEqual(201, table._row_offset)
+        self.assertEqual(22 + 200 * 7, table._height)
+        self.assertTrue(self.pdf.page_number > 1)
+
+    def _stream_retained(self, count):
+        """Return the objects retained after a streamed table"""
+        self.pdf = Pdf(styles=self.library)
+        retained = []
+
+        def content():
+            table = self._table([])
+            rows = (('a%s' % i, 'b%s' % i) for i in range(count))
+            table.render_stream(rows, style='row')
+            gc.collect()
+            retained.append(len([o for o in gc.get_objects()
+                                 if isinstance(o, (ExtendedFlowable,
+                                                   DisplayList))]))
+            retained.append(list.__len__(self.pdf._story))
+            yield
+
+        self.pdf.write_stream(OutputBuffer(), content())
+        self.assertTrue(self.pdf.page_number > count / 50)
+        return retained
+
+    def test_render_stream_released(self):
+        """Test Table.render_stream(self, rows, style=None) with
+        Pdf.write_stream"""
+        # The chunks are drawn and released as the pages are written
+        self.assertEqual(self._stream_retained(200),
+                         self._stream_retained(2000))
+
+    def test_render_stream_measured_chunks(self):
+        """Test Table.render_stream(self, rows, style=None)"""
+        self.library.define('flat', RowStyle(height=0))
+        table = self._table([])
+        chunks = []
+        render_chunk = table._render_chunk
+
+        def wrapper(first_chunk):
+            chunks.append(len(table._rows))
+            render_chunk(first_chunk)
+
+        table._render_chunk = wrapper
+        rows = (('a%s' % i, 'b%s' % i) for i in range(3000))
+        table.render_stream(rows, style='flat')
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(3000, sum(chunks))
+        self.assertTrue(max(chunks) < 3000)
+
+    def test_render_stream_chunk_widths(self):
+        """Test Table.render_stream(self, rows, style=None)"""
+        table = self._table([])
+        widths = []
+        wrap_cell = table._wrap_cell
+
+        def wrapper(row, c_idx, style):
+            paragraph, width, height = wrap_cell(row, c_idx, style)
+            if c_idx == 0 and row.values[0] == 'large':
+                # The content is larger than the column
+                width = 50
+            if c_idx == 0:
+                widths.append(style.width)
+            return paragraph, width, height
+
+        table._wrap_cell = wrapper
+        rows = [('large', 'a')]
+        rows.extend([('b%s' % i, 'b') for i in range(200)])
+        table.render_stream(rows, style='row')
+        self.assertEqual(52, table._col_widths[0])
+        self.assertEqual(10, widths[0])
+        self.assertEqual(set([52]), set(widths[-100:]))
+
+    def test_render_stream_style_callable(self):
+        """Test Table.render_stream(self, rows, style=None)"""
+        table = self._table([])
+        styles = []
+
+        def style(index, content):
+            styles.append((index, content))
+            return index % 2 and 'middle' or 'row'
+
+        table.render_stream([('a', 'b'), ('c', 'd')], style=style)
+        self.assertEqual([(0, ('a', 'b')), (1, ('c', 'd'))], styles)
+        self.assertEqual(7 + 22, table._height)
+
+    def test_render_stream_wrong_length(self):
+        """Test Table.render_stream(self, rows, style=None)"""
+        table = self._table([])
+        self.assertRaises(ValueError, table.render_stream, [('a', )], 'row')
+
+    def test_add_row_format(self):
+        """Test Table.add_row(self, content, title=None, style=None)"""
+        table = self._table([(['Title', 'a'], 'row')], formats=('%.2f', str))
+        self.assertEqual(('Title', 'a'), table._rows[0].values)
+
+    def test_render_stream_format(self):
+        """Test Table.render_stream(self, rows, style=None)"""
+        table = self._table([(['Title', 'a'], 'row')], formats=('%.2f', str))
+        values = []
+        wrap_paragraph = self.pdf.wrap_paragraph
+
+        def wrapper(text, *args, **kwargs):
+            values.append(text)
+            return wrap_paragraph(text, *args, **kwargs)
+
+        self.pdf.wrap_paragraph = wrapper
+        table.render_stream([(1.5, 2)], style='row')
+        self.assertEqual(['Title', 'a', '1.50', '2'], values)
+
+    def test_add_rows_from_columns(self):
+        """Test Table.add_rows_from_columns(self, columns, style=None)"""
+        table = self._table([], formats=('%.1f', None))
+        table.add_rows_from_columns(
+            [(1, 2, 3), ('a', 'b', 'c')],
+            style=lambda i, c: i and 'row' or 'middle',
+        )
+        self.assertEqual([('1.0', 'a'), ('2.0', 'b'), ('3.0', 'c')],
+                         [r.values for r in table._rows])
+        self.assertEqual(['middle', 'row', 'row'],
+                         [r.style for r in table._rows])
+        self.assertEqual(22 + 7 * 2, table._height)
+
+    def test_add_rows_from_columns_wrong_length(self):
+        """Test Table.add_rows_from_columns(self, columns, style=None)"""
+        table = self._table([])
+        self.assertRaises(ValueError, table.add_rows_from_columns,
+                          [(1, 2)], 'row')
+        self.assertRaises(ValueError, table.add_rows_from_columns,
+                          [(1, 2), (1, )], 'row')
+
+    @unittest2.skipIf(table_module.numpy is None, 'NumPy is not installed')
+    def test_add_rows_from_columns_numpy(self):
+        """Test Table.add_rows_from_columns(self, columns, style=None)"""
+        numpy = table_module.numpy
+        table = self._table([], formats=('%.2f', None))
+        table.add_rows_from_columns(
+            [numpy.array([1.5, 2.25]), numpy.array(['a', 'b'])],
+            style='row',
+        )
+        self.assertEqual([('1.50', 'a'), ('2.25', 'b')],
+                         [r.values for r in table._rows])
+
+    def test_add_rows_from_csv(self):
+        """Test Table.add_rows_from_csv(self, csvfile, style=None, ...)"""
+        table = self._table([], formats=(None, lambda v: v.upper()))
+        csvfile = StringIO('Code;Label\n1;paid\n2;due\n')
+        table.add_rows_from_csv(csvfile, style='row', header_style='middle',
+                                delimiter=';')
+        self.assertEqual([('Code', 'Label'), ('1', 'PAID'), ('2', 'DUE')],
+                         [r.values for r in table._rows])
+        self.assertEqual('middle', table._rows[0].style)
+        table.render()
+
+    def test_add_rows_from_csv_converters(self):
+        """Test Table.add_rows_from_csv(self, csvfile, style=None, ...)"""
+        table = self._table([], formats=('%.2f', None))
+        csvfile = StringIO('1.5,a\n2,b\n')
+        self.assertRaises(TypeError, table.add_rows_from_csv, csvfile,
+                          style='row')
+        csvfile.seek(0)
+        table.add_rows_from_csv(csvfile, style='row',
+                                converters=(float, None))
+        self.assertEqual([('1.50', 'a'), ('2.00', 'b')],
+                         [r.values for r in table._rows])
+        self.assertRaises(ValueError, table.add_rows_from_csv, csvfile,
+                          style='row', converters=(float, ))
+
+    def test_pagination_plan(self):
+        """Test Table.pagination_plan(self)"""
+        table = self._table([(['a', 'b'], 'row')] * 100)
+        plan = table.pagination_plan()
+
+        self.assertEqual([7] * 100, plan.heights)
+        self.assertEqual(self.pdf.height, plan.page_height)
+        self.assertEqual(3, plan.page_count)
+        table.render()
+        self.assertEqual(3, self.pdf.page_number)
+        self.assertEqual(plan.end_height, self.pdf.current_height)
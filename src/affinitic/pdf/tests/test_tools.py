@@ -8,6 +8,8 @@ Created by mpeeters
 :license: GPL, see LICENCE.txt for more details.
 """
 
+import copy
+import pickle
 import unittest2
 
 from affinitic.pdf import tools
@@ -31,3 +33,24 @@ class TestColorRGB(unittest2.TestCase):
         self.assertEqual(1.0, rgb.green)
         self.assertEqual(1.0, rgb.blue)
         self.assertEqual(1.0, rgb.alpha)
+
+    def test_palette(self):
+        color = tools.ColorRGB(10, 20, 30)
+        self.assertTrue(color is tools.ColorRGB(r=10.0, g=20, b=30))
+        self.assertFalse(color is tools.ColorRGB(10, 20, 30, alpha=50))
+        self.assertTrue(color.rgb is color.rgb)
+        self.assertTrue(color.cmyk is color.cmyk)
+
+    def test_read_only(self):
+        color = tools.ColorRGB(10, 20, 30, alpha=50)
+        for name in ('red', 'green', 'blue', 'alpha'):
+            self.assertRaises(AttributeError, setattr, color, name, 0)
+        self.assertEqual((10, 20, 30, 0.5),
+                         (color.red, color.green, color.blue, color.alpha))
+        self.assertEqual(10 / 255., color.rgb.red)
+
+    def test_copy(self):
+        color = tools.ColorRGB(10, 20, 30, alpha=7)
+        self.assertTrue(color is copy.copy(color))
+        self.assertTrue(color is copy.deepcopy({'color': color})['color'])
+        self.assertTrue(color is pickle.loads(pickle.dumps(color)))
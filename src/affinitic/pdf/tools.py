@@ -14,24 +14,74 @@ from reportlab.lib.colors import rgb2cmyk
 
 
 class ColorRGB(object):
+    """
+    A RGB color, the colors are interned and their ReportLab colors are
+    computed once, a color is shared and its components are read-only
+    """
+    _palette = {}
+    _palette_size = 1024
+
+    def __new__(cls, r=0, g=0, b=0, alpha=100):
+        key = (cls, float(r), float(g), float(b), float(alpha))
+        color = cls._palette.get(key)
+        if color is None:
+            color = super(ColorRGB, cls).__new__(cls)
+            color._key = key
+            color._rgb = None
+            color._cmyk = None
+            if len(cls._palette) < cls._palette_size:
+                cls._palette[key] = color
+        return color
 
     def __init__(self, r=0, g=0, b=0, alpha=100):
-        self.red = float(r)
-        self.green = float(g)
-        self.blue = float(b)
-        self.alpha = float(alpha) / 100
+        # The attributes are defined by __new__
+        pass
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (self.__class__, self._key[1:])
+
+    @property
+    def red(self):
+        """Return the red component (0 to 255)"""
+        return self._key[1]
+
+    @property
+    def green(self):
+        """Return the green component (0 to 255)"""
+        return self._key[2]
+
+    @property
+    def blue(self):
+        """Return the blue component (0 to 255)"""
+        return self._key[3]
+
+    @property
+    def alpha(self):
+        """Return the opacity (0 to 1)"""
+        return self._key[4] / 100
 
     @property
     def cmyk(self):
         """Return an CMYKColor for the current color"""
-        cmyk = rgb2cmyk(self.red / 255, self.green / 255, self.blue / 255)
-        return CMYKColor(cmyk[0], cmyk[1], cmyk[2], cmyk[3], alpha=self.alpha)
+        if self._cmyk is None:
+            cmyk = rgb2cmyk(self.red / 255, self.green / 255, self.blue / 255)
+            self._cmyk = CMYKColor(cmyk[0], cmyk[1], cmyk[2], cmyk[3],
+                                   alpha=self.alpha)
+        return self._cmyk
 
     @property
     def rgb(self):
         """Return an CMYKColor for the current color"""
-        return Color(
-            self.red / 255,
-            self.green / 255,
-            self.blue / 255,
-            alpha=self.alpha)
+        if self._rgb is None:
+            self._rgb = Color(
+                self.red / 255,
+                self.green / 255,
+                self.blue / 255,
+                alpha=self.alpha)
+        return self._rgb